@@ -13,10 +13,20 @@ output file format:
         emit, ambient, translucency
 """
 
-import re
+import os
 import bpy
+import numpy as np
 from mathutils import Vector
 
+from . import cache
+from . import formats
+from . import isolation
+from . import modal
+from . import profiling
+from . import sampling
+from . import selection
+from . import shards
+
 bl_info = {
     "name": "save object keyframes",
     "author": "Drunkar",
@@ -34,241 +44,281 @@ bl_info = {
 addon_keymaps = []
 
 
-class SaveKeyframes(bpy.types.Operator):
+def export_filepath(scene):
+    # export file next to the .blend file unless the file name is an absolute
+    # path, extension follows the file format
+    file_name = scene.save_keyframes_file_name
+    if not os.path.isabs(file_name):
+        file_name = "//" + file_name
+    return bpy.path.abspath(
+        file_name + formats.extension(scene.save_keyframes_file_format, scene.save_keyframes_gzip))
+
+
+def draw_filters(layout, context):
+    # object filters of selection.select()
+    if bpy.app.version < (2, 80, 0):
+        layout.prop_search(context.scene, "save_keyframes_collection", bpy.data, "groups")
+    else:
+        layout.prop_search(context.scene, "save_keyframes_collection", bpy.data, "collections")
+    layout.prop(context.scene, "save_keyframes_object_types")
+    layout.prop(context.scene, "save_keyframes_animated_only")
+
+
+def open_writer(scene, filepath, file_format, columns, **kwargs):
+    # formats.open_writer() with the file format options set in scene, timed
+    # when the export is profiled
+    return profiling.instrument(formats.open_writer(
+        filepath, file_format, columns, precision=scene.save_keyframes_precision,
+        codec=scene.save_keyframes_codec, compressed=scene.save_keyframes_gzip,
+        decimals=scene.save_keyframes_decimals if scene.save_keyframes_fixed else None, **kwargs))
+
+
+def draw_file_format(layout, context):
+    # file format and the options of the format set in scene
+    layout.prop(context.scene, "save_keyframes_file_format")
+    if context.scene.save_keyframes_file_format == "DELTA":
+        layout.prop(context.scene, "save_keyframes_precision")
+        layout.prop(context.scene, "save_keyframes_codec")
+    else:
+        layout.prop(context.scene, "save_keyframes_gzip")
+        layout.prop(context.scene, "save_keyframes_fixed")
+        if context.scene.save_keyframes_fixed:
+            layout.prop(context.scene, "save_keyframes_decimals")
+
+
+def draw_profile(layout, context):
+    # see profiling.py
+    layout.prop(context.scene, "save_keyframes_profile")
+    if context.scene.save_keyframes_profile:
+        layout.prop(context.scene, "save_keyframes_profile_json")
+
+
+def draw_sampling_options(layout, context, workers=False):
+    # options of the modal.ModalExport exporters: cache, isolation,
+    # background export, profile and, for those exporting in several
+    # processes, the workers
+    layout.prop(context.scene, "save_keyframes_use_cache")
+    layout.prop(context.scene, "save_keyframes_cache_size")
+    layout.prop(context.scene, "save_keyframes_isolate")
+    layout.prop(context.scene, "save_keyframes_modal")
+    if workers:
+        layout.prop(context.scene, "save_keyframes_workers")
+        layout.prop(context.scene, "save_keyframes_worker_retries")
+    draw_profile(layout, context)
+
+
+def export_mesh_animation(context, objs, names, frames, filepath, file_format):
+    # writes the world space vertices of the meshes objs at frames, all the
+    # meshes of a frame in one write. names: vertex id prefix of each mesh.
+    # yields (frames done, frames total, frames written), see modal.ModalExport
+    if bpy.app.version >= (2, 80, 0):
+        hide_initial = [obj.hide_viewport for obj in objs]
+        for obj in objs:
+            obj.hide_viewport = False
+    # vertex ids of every mesh and of the rows of a frame, rebuilt only when
+    # the vertex count of a mesh changes
+    ids_of_objs = [[] for obj in objs]
+    ids = []
+    try:
+        with open_writer(context.scene, filepath, file_format,
+                         formats.VERTEX_COLUMNS, suffix=formats.VERTEX_SUFFIX) as writer, \
+                isolation.isolated(context, objs) as (scene, depsgraph):
+            for done, (frame, vertices) in enumerate(cache.sample_vertices(
+                    context, objs, frames, cache.export_cache(context.scene), scene, depsgraph), 1):
+                if any(len(obj_ids) != len(co) for obj_ids, co in zip(ids_of_objs, vertices)):
+                    ids_of_objs = [obj_ids if len(obj_ids) == len(co) else formats.vertex_ids(name, len(co))
+                                   for obj_ids, co, name in zip(ids_of_objs, vertices, names)]
+                    ids = [i for obj_ids in ids_of_objs for i in obj_ids]
+                if vertices:
+                    writer.write(ids, frame, np.concatenate([co[::-1] for co in vertices]), key="vertices")
+                yield done, len(frames), done
+    finally:
+        if bpy.app.version >= (2, 80, 0):
+            for obj, hide in zip(objs, hide_initial):
+                obj.hide_viewport = hide
+
+
+class SaveKeyframes(modal.ModalExport, bpy.types.Operator):
 
     bl_idname = "object.save_object_keyframes"
     bl_label = "save object keyframes"
     bl_description = "Save keyframes of object, which matched a keyword."
     bl_options = {"REGISTER", "UNDO"}
 
-    # main
-    def execute(self, context):
-        objs = []
-        for name, obj in bpy.context.scene.objects.items():
-            matched = re.search(context.scene.save_keyframes_id_key, name)
-            if matched:
-                objs.append(obj)
+    # main, see modal.ModalExport
+    def export(self, context):
+        with profiling.phase("select"):
+            objs = selection.select(context)
 
-        keyframes = {}
+        if not bpy.data.is_saved:
+            raise Exception("Please save blender file first.")
+
+        # rows are written in order of frame asc, then object name
+        objs.sort(key=lambda obj: obj.name)
+        frames_of_objs = []
         start_frame = context.scene.save_keyframes_start_frame
         end_frame = context.scene.save_keyframes_end_frame
-        for obj in objs:
-
-            # extract keyframes
-            # [[keyframe_index, frame, value], [], ...]
-            if obj.animation_data is not None:
-                fcurves = obj.animation_data.action.fcurves
-            elif obj.parent.animation_data is not None:
-                fcurves = obj.parent.animation_data.action.fcurves
-            elif obj.parent.parent.animation_data is not None:
-                fcurves = obj.parent.parent.animation_data.action.fcurves
-            elif obj.parent.parent.parent.animation_data is not None:
-                fcurves = obj.parent.parent.parent.animation_data.action.fcurve
-            elif obj.parent.parent.parent.parent.animation_data is not None:
-                fcurves = obj.parent.parent.parent.parent.animation_data.action.fcurve
-            elif obj.parent.parent.parent.parent.parent.animation_data is not None:
-                fcurves = obj.parent.parent.parent.parent.parent.animation_data.action.fcurve
-            elif obj.parent.parent.parent.parent.parent.parent.animation_data is not None:
-                fcurves = obj.parent.parent.parent.parent.parent.parent.animation_data.action.fcurve
-            elif obj.parent.parent.parent.parent.parent.parent.parent.animation_data is not None:
-                fcurves = obj.parent.parent.parent.parent.parent.parent.parent.animation_data.action.fcurve
-            else:
-                fcurves = []
-            frames = []
-            for fc in fcurves:
-                if fc.data_path.endswith(("location", "rotation_euler", "scale")):
-                    frames += [int(i.co[0]) for i in fc.keyframe_points if i.co[0] >= start_frame and i.co[0] <= end_frame]
-            frames = list(set(frames))
-
-            # register keyframes
-            # {obj_name: {
-            #     frame_1: [
-            #               location_0,location_1,location_2,
-            #               rotation_euler_0,rotation_euler_1,rotation_euler_2,
-            #               sale_0,scale_1,scale_2
-            #              ],
-            #     frame_2: [], ...}
-            keyframes[obj.name] = {}
-            for frame in frames:
-                bpy.context.scene.frame_set(frame)
-                loc = obj.matrix_world.to_translation()
-                rot = obj.matrix_world.to_euler()
-                sca = obj.matrix_world.to_scale()
-                keyframes[obj.name][str(frame)] = [loc[0], loc[1], loc[2], rot[0], rot[1], rot[2], sca[0], sca[1], sca[2]]
+        ancestors = sampling.animated_ancestors(objs)
+        frames_of_ancestors = {}
+        with profiling.phase("keyframes"):
+            for obj in objs:
 
-        if bpy.data.is_saved:
-            filepath = bpy.path.abspath(
-                "//" + context.scene.save_keyframes_file_name + ".csv")
-            with open(filepath, "w", encoding="utf-8") as f:
-                for uav, frames in keyframes.items():
-                    for frame, v in frames.items():
-                        v = map(str, v)
-                        f.write(uav + "," + frame + "," + ",".join(v) + "\n")
-        else:
-            raise Exception("Please save blender file first.")
-        return {"FINISHED"}
+                # extract keyframes of the object, or of its nearest animated
+                # ancestor. objects of the same ancestor share its frames
+                ancestor = ancestors[obj.name]
+                if ancestor is None:
+                    frames = []
+                elif ancestor.name in frames_of_ancestors:
+                    frames = frames_of_ancestors[ancestor.name]
+                else:
+                    frames = frames_of_ancestors[ancestor.name] = sampling.keyframe_frames(
+                        ancestor.animation_data.action.fcurves, sampling.TRANSFORM_PATHS,
+                        start_frame, end_frame)
+                frames_of_objs.append((obj, frames))
+
+        # rows of each frame are written as soon as the frame is sampled:
+        # [location_0,location_1,location_2,
+        #  rotation_euler_0,rotation_euler_1,rotation_euler_2,
+        #  sale_0,scale_1,scale_2], see formats.transform_columns()
+        filepath = export_filepath(context.scene)
+        rotation = context.scene.save_keyframes_rotation
+        total = len(set().union(*(frames for obj, frames in frames_of_objs)))
+        with open_writer(context.scene, filepath, context.scene.save_keyframes_file_format,
+                         formats.transform_columns(rotation)) as writer, \
+                isolation.isolated(context, objs) as (scene, depsgraph):
+            for done, (frame, rows) in enumerate(cache.sample_keyframe_transforms(
+                    scene, frames_of_objs, cache.export_cache(context.scene), depsgraph, rotation), 1):
+                writer.write([obj.name for obj, row in rows], frame, np.array([row for obj, row in rows]))
+                yield done, total, done
 
     def draw(self, context):
         col = self.layout.column(align=True)
         col.prop(context.scene, "save_keyframes_id_key")
+        draw_filters(col, context)
         col.prop(context.scene, "save_keyframes_start_frame")
         col.prop(context.scene, "save_keyframes_end_frame")
+        col.prop(context.scene, "save_keyframes_rotation")
         col.prop(context.scene, "save_keyframes_file_name")
+        draw_file_format(col, context)
+        draw_sampling_options(col, context)
 
     def invoke(self, context, event):
         return context.window_manager.invoke_props_dialog(self)
 
 
-class SaveAnimations(bpy.types.Operator):
+class SaveAnimations(modal.ModalExport, bpy.types.Operator):
 
     bl_idname = "object.save_animations"
     bl_label = "save positions of each frames to csv"
     bl_description = "Save positions of object, which matched a keyword."
     bl_options = {"REGISTER", "UNDO"}
 
-    # main
-    def execute(self, context):
-        objs = []
-        for name, obj in bpy.context.scene.objects.items():
-            if bpy.app.version < (2, 80, 0):
-                sel = obj.select
-            else:
-                sel = obj.select_get()
-            if sel:
-                matched = re.search(context.scene.save_keyframes_id_key, name)
-                if matched:
-                    objs.append(obj)
+    # main, see modal.ModalExport
+    def export(self, context):
+        with profiling.phase("select"):
+            objs = selection.select(context, selected=True)
+
+        if not bpy.data.is_saved:
+            raise Exception("Please save blender file first.")
 
         start_frame = context.scene.save_keyframes_start_frame
         end_frame = context.scene.save_keyframes_end_frame
         interval = context.scene.save_keyframes_interval
-        last_frame_is_included = (end_frame - start_frame) % interval == 0
-        keyframes = {}
-        frames = []
-        for obj in objs:
-            # register keyframes
-            # {obj_name: {
-            #     frame_1: [
-            #               location_0,location_1,location_2,
-            #               rotation_euler_0,rotation_euler_1,rotation_euler_2,
-            #               sale_0,scale_1,scale_2
-            #              ],
-            #     frame_2: [], ...}
-            keyframes[obj.name] = {}
-            for frame in range(start_frame, end_frame+1)[::interval]:
-                if len(keyframes) == 1:
-                    frames.append(str(frame))
-                bpy.context.scene.frame_set(frame)
-                loc = obj.matrix_world.to_translation()
-                rot = obj.matrix_world.to_euler()
-                sca = obj.matrix_world.to_scale()
-                keyframes[obj.name][str(frame)] = [loc[0], loc[1], loc[2], rot[0], rot[1], rot[2], sca[0], sca[1], sca[2]]
-            if not last_frame_is_included:
-                bpy.context.scene.frame_set(end_frame)
-                loc = obj.matrix_world.to_translation()
-                rot = obj.matrix_world.to_euler()
-                sca = obj.matrix_world.to_scale()
-                keyframes[obj.name][str(end_frame)] = [loc[0], loc[1], loc[2], rot[0], rot[1], rot[2], sca[0], sca[1], sca[2]]
-
-        # write csv in order of frame asc
+        frames = sampling.export_frames(start_frame, end_frame, interval)
+
+        # write csv in order of frame asc, rows of each frame are written
+        # as soon as the frame is sampled:
+        # [location_0,location_1,location_2,
+        #  rotation_euler_0,rotation_euler_1,rotation_euler_2,
+        #  sale_0,scale_1,scale_2], see formats.transform_columns()
+        objs.sort(key=lambda obj: obj.name)
         obj_names = [obj.name for obj in objs]
-        obj_names.sort()
-        if bpy.data.is_saved:
-            filepath = bpy.path.abspath(
-                "//" + context.scene.save_keyframes_file_name + ".csv")
-            with open(filepath, "w", encoding="utf-8") as f:
-                for fr in frames:
-                    for obj_name in obj_names:
-                        v = map(str, keyframes[obj_name][fr])
-                        f.write(obj_name + "," + fr + "," + ",".join(v) + "\n")
-        else:
-            raise Exception("Please save blender file first.")
-        return {"FINISHED"}
+        filepath = export_filepath(context.scene)
+        rotation = context.scene.save_keyframes_rotation
+        with open_writer(context.scene, filepath, context.scene.save_keyframes_file_format,
+                         formats.transform_columns(rotation)) as writer, \
+                isolation.isolated(context, objs) as (scene, depsgraph):
+            sampled = cache.sample_transforms(
+                scene, objs, frames, cache.export_cache(context.scene), depsgraph, rotation)
+            if not context.scene.save_keyframes_adaptive:
+                for done, (frame, rows) in enumerate(sampled, 1):
+                    writer.write(obj_names, frame, rows, key="objects")
+                    yield done, len(frames), done
+                return
+            # adaptive: the whole trajectory of every object is sampled, then
+            # only the frames needed to interpolate it within the tolerances
+            # are written, none until every frame is sampled
+            trajectories = np.empty((len(frames), len(objs), sampling.TRANSFORM_WIDTHS[rotation]))
+            for j, (frame, rows) in enumerate(sampled):
+                trajectories[j] = rows
+                yield j + 1, len(frames), 0
+            keep = np.empty((len(frames), len(objs)), dtype=bool)
+            with profiling.phase("adaptive"):
+                for i in range(len(objs)):
+                    keep[:, i] = sampling.adaptive_frames(
+                        frames, trajectories[:, i],
+                        context.scene.save_keyframes_position_tolerance,
+                        context.scene.save_keyframes_rotation_tolerance, rotation)
+            for j, frame in enumerate(frames):
+                kept = np.flatnonzero(keep[j])
+                writer.write([obj_names[i] for i in kept], frame, trajectories[j, kept])
+        yield len(frames), len(frames), len(frames)
 
     def draw(self, context):
         col = self.layout.column(align=True)
         col.prop(context.scene, "save_keyframes_id_key")
+        draw_filters(col, context)
         col.prop(context.scene, "save_keyframes_start_frame")
         col.prop(context.scene, "save_keyframes_end_frame")
         col.prop(context.scene, "save_keyframes_interval")
+        col.prop(context.scene, "save_keyframes_adaptive")
+        if context.scene.save_keyframes_adaptive:
+            col.prop(context.scene, "save_keyframes_position_tolerance")
+            col.prop(context.scene, "save_keyframes_rotation_tolerance")
+        col.prop(context.scene, "save_keyframes_rotation")
         col.prop(context.scene, "save_keyframes_file_name")
+        draw_file_format(col, context)
+        draw_sampling_options(col, context)
 
     def invoke(self, context, event):
         return context.window_manager.invoke_props_dialog(self)
 
 
-class SaveAnimationsOfMesh(bpy.types.Operator):
+class SaveAnimationsOfMesh(modal.ModalExport, bpy.types.Operator):
 
     bl_idname = "object.save_animations_of_mesh"
     bl_label = "save positions of each frames in mesh to csv"
     bl_description = "Save positions of object, which matched a keyword."
     bl_options = {"REGISTER", "UNDO"}
 
-    # main
-    def execute(self, context):
-        objs = []
-        for name, obj in bpy.context.scene.objects.items():
-            matched = re.search(context.scene.save_keyframes_id_key, name)
-            if matched:
-                objs.append(obj)
+    # main, see modal.ModalExport
+    def export(self, context):
+        with profiling.phase("select"):
+            objs = selection.select(context, types=("MESH",))
 
         start_frame = context.scene.save_keyframes_start_frame
         end_frame = context.scene.save_keyframes_end_frame
         interval = context.scene.save_keyframes_interval
-        last_frame_is_included = (end_frame - start_frame) % interval == 0
-        filepath = bpy.path.abspath(
-            "//" + context.scene.save_keyframes_file_name + ".csv")
-        with open(filepath, "w", encoding="utf-8") as f:
-            for obj in objs:
-                # register keyframes
-                # {obj_name: {
-                #     frame_1: [
-                #               location_0,location_1,location_2,
-                #               rotation_euler_0,rotation_euler_1,rotation_euler_2,
-                #               sale_0,scale_1,scale_2
-                #              ],
-                #     frame_2: [], ...}
-                if bpy.app.version >= (2, 80, 0):
-                    hide_initial = obj.hide_viewport
-                    obj.hide_viewport = False
-                for frame in range(start_frame, end_frame+1)[::interval]:
-                    bpy.context.scene.frame_set(frame)
-                    if bpy.app.version >= (2, 80, 0):
-                        depsgraph = bpy.context.evaluated_depsgraph_get()
-                        ob_eval = obj.evaluated_get(depsgraph)
-                        mesh = ob_eval.to_mesh()
-                        mesh.transform(ob_eval.matrix_world) # apply modifiers with preview settings
-                    else:
-                        mesh = obj.to_mesh(bpy.context.scene, True, 'PREVIEW')
-                        mesh.transform(obj.matrix_world) # apply modifiers with preview settings
-                    verts = [vert.co for vert in mesh.vertices]
-                    for i, v in enumerate(verts[::-1]):
-                        f.write(obj.name + "_" + ("000000" + str(i+1))[-6:] + "," + str(frame) + "," + str(v[0]) + "," + str(v[1]) + "," + str(v[2]) + ",0,0,0,1.0,1.0,1.0\n")
-
-                if not last_frame_is_included:
-                    bpy.context.scene.frame_set(end_frame)
-                    if bpy.app.version >= (2, 80, 0):
-                        depsgraph = bpy.context.evaluated_depsgraph_get()
-                        ob_eval = obj.evaluated_get(depsgraph)
-                        mesh = ob_eval.to_mesh()
-                        mesh.transform(ob_eval.matrix_world) # apply modifiers with preview settings
-                    else:
-                        mesh = obj.to_mesh(bpy.context.scene, True, 'PREVIEW')
-                        mesh.transform(obj.matrix_world) # apply modifiers with preview settings
-                    verts = [vert.co for vert in mesh.vertices]
-                    for i, v in enumerate(verts[::-1]):
-                        f.write(obj.name + "_" + ("000000" + str(i+1))[-6:] + "," + str(frame) + "," + str(v[0]) + "," + str(v[1]) + "," + str(v[2]) + ",0,0,0,1.0,1.0,1.0\n")
-                if bpy.app.version >= (2, 80, 0):
-                    obj.hide_viewport = hide_initial
-        return {"FINISHED"}
+        frames = sampling.export_frames(start_frame, end_frame, interval)
+        filepath = export_filepath(context.scene)
+        if context.scene.save_keyframes_workers > 1:
+            yield from shards.export_sharded(context, "animations_of_mesh", frames, interval, filepath,
+                                             ["--id-key=" + context.scene.save_keyframes_id_key],
+                                             report=self.report)
+            return
+        yield from export_mesh_animation(context, objs, [obj.name for obj in objs], frames, filepath,
+                                         context.scene.save_keyframes_file_format)
 
     def draw(self, context):
         col = self.layout.column(align=True)
         col.prop(context.scene, "save_keyframes_id_key")
+        draw_filters(col, context)
         col.prop(context.scene, "save_keyframes_start_frame")
         col.prop(context.scene, "save_keyframes_end_frame")
         col.prop(context.scene, "save_keyframes_interval")
         col.prop(context.scene, "save_keyframes_file_name")
+        draw_file_format(col, context)
+        draw_sampling_options(col, context, workers=True)
 
     def invoke(self, context, event):
         return context.window_manager.invoke_props_dialog(self)
@@ -282,56 +332,49 @@ class SaveMaterialKeyframes(bpy.types.Operator):
     bl_options = {"REGISTER", "UNDO"}
 
     # main
+    @profiling.profiled
     def execute(self, context):
         keyframe_index = {"diffuse_color": 0, "specular_color": 3,
                           "emit": 6, "ambient": 7, "translucency": 8}
-        objs = []
-        for obj in bpy.context.selected_objects:
-            matched = re.search(context.scene.save_keyframes_id_key, obj.name)
-            if matched:
-                objs.append(obj)
+        with profiling.phase("select"):
+            objs = selection.select_from(context, bpy.context.selected_objects)
 
         keyframes = {}
         start_frame = context.scene.save_keyframes_start_frame
         end_frame = context.scene.save_keyframes_end_frame
-        for obj in objs:
+        with profiling.phase("keyframes"):
+            for obj in objs:
 
-            # extract keyframes
-            # [[keyframe_index, frame, value], [], ...]
-            kfs = []
-            for fc in obj.active_material.animation_data.action.fcurves:
-                if fc.data_path.endswith(("diffuse_color", "specular_color",
-                                          "emit", "ambient", "translucency")):
-                    kfs += [[keyframe_index[fc.data_path] + fc.array_index, i.co[0], i.co[1]]
-                            for i in fc.keyframe_points
-                            if i.co[0] >= start_frame and i.co[0] <= end_frame]
-
-            # register keyframes
-            # {obj_name: {
-            #     frame_1: [
-            #               diffuse_color_r,diffuse_color_g,diffuse_color_b,
-            #               specular_color_r,specular_color_g,specular_color_b,
-            #               emit,ambient,translucency
-            #              ],
-            #     frame_2: [], ...}
-            keyframes[obj.name] = {}
-            for key in kfs:
-                fr = str(int(key[1]))
-                if fr in keyframes[obj.name]:
-                    keyframes[obj.name][fr][key[0]] = key[2]
-                else:
-                    keyframes[obj.name][fr] = [
-                        0, 0, 0, 0, 0, 0, 1, 1, 1]
-                    keyframes[obj.name][fr][key[0]] = key[2]
+                # extract keyframes
+                # [(keyframe_index, frames, values), ...]
+                kfs = []
+                for fc in obj.active_material.animation_data.action.fcurves:
+                    if fc.data_path.endswith(("diffuse_color", "specular_color",
+                                              "emit", "ambient", "translucency")):
+                        frames, values = sampling.keyframe_points(fc)
+                        frames, inside = sampling.keyed_frames(frames, start_frame, end_frame)
+                        kfs.append((keyframe_index[fc.data_path] + fc.array_index, frames, values[inside]))
+
+                # register keyframes
+                # {obj_name: (sorted frames, rows of each frame: [
+                #               diffuse_color_r,diffuse_color_g,diffuse_color_b,
+                #               specular_color_r,specular_color_g,specular_color_b,
+                #               emit,ambient,translucency
+                #              ])}
+                # unkeyed values are written as the integer defaults
+                frames = np.unique(np.concatenate([k[1] for k in kfs])) if kfs else np.empty(0, np.int64)
+                rows = np.empty((len(frames), 9), dtype=object)
+                rows[:] = [0, 0, 0, 0, 0, 0, 1, 1, 1]
+                for index, fr, values in kfs:
+                    rows[np.searchsorted(frames, fr), index] = values.tolist()
+                keyframes[obj.name] = (frames.tolist(), rows)
 
         if bpy.data.is_saved:
-            filepath = bpy.path.abspath(
-                "//" + context.scene.save_keyframes_file_name + ".csv")
-            with open(filepath, "w", encoding="utf-8") as f:
-                for uav, frames in keyframes.items():
-                    for frame, v in frames.items():
-                        v = map(str, v)
-                        f.write(uav + "," + frame + "," + ",".join(v) + "\n")
+            filepath = export_filepath(context.scene)
+            with open_writer(context.scene, filepath, context.scene.save_keyframes_file_format,
+                             formats.MATERIAL_COLUMNS) as writer:
+                for uav, (frames, rows) in keyframes.items():
+                    writer.write([uav] * len(frames), frames, rows)
         else:
             raise Exception("Please save blender file first.")
         return {"FINISHED"}
@@ -339,9 +382,12 @@ class SaveMaterialKeyframes(bpy.types.Operator):
     def draw(self, context):
         col = self.layout.column(align=True)
         col.prop(context.scene, "save_keyframes_id_key")
+        draw_filters(col, context)
         col.prop(context.scene, "save_keyframes_start_frame")
         col.prop(context.scene, "save_keyframes_end_frame")
         col.prop(context.scene, "save_keyframes_file_name")
+        draw_file_format(col, context)
+        draw_profile(col, context)
 
     def invoke(self, context, event):
         return context.window_manager.invoke_props_dialog(self)
@@ -356,24 +402,20 @@ class SaveSelectionPositions(bpy.types.Operator):
     filepath = bpy.props.StringProperty(subtype="FILE_PATH")
 
     # main
+    @profiling.profiled
     def execute(self, context):
-        with open(self.filepath, "w", encoding="utf-8") as f:
-            if bpy.app.version < (2, 80, 0):
-                objs = [o for o in bpy.context.scene.objects if o.select][::-1]
-            else:
-                objs = [o for o in bpy.context.scene.objects if o.select_get()][::-1]
-            for obj in objs:
-                loc = obj.matrix_world.to_translation()
-                rot = obj.matrix_world.to_euler()
-                sca = obj.matrix_world.to_scale()
-                f.write(
-                    obj.name + "," + str(bpy.context.scene.frame_current) + ","
-                    + str(loc[0]) + "," + str(loc[1])
-                    + "," + str(loc[2]) + ","
-                    + str(rot[0]) +
-                    "," + str(rot[1])
-                    + "," + str(rot[2]) + ","
-                    + str(sca[0]) + "," + str(sca[1]) + "," + str(sca[2]) + "\n")
+        file_format = context.scene.save_keyframes_file_format
+        filepath = formats.output_path(self.filepath, file_format, context.scene.save_keyframes_gzip)
+        rotation = context.scene.save_keyframes_rotation
+        with open_writer(context.scene, filepath, file_format, formats.transform_columns(rotation)) as writer:
+            with profiling.phase("select"):
+                if bpy.app.version < (2, 80, 0):
+                    objs = [o for o in bpy.context.scene.objects if o.select][::-1]
+                else:
+                    objs = [o for o in bpy.context.scene.objects if o.select_get()][::-1]
+            with profiling.phase("matrix_world"):
+                rows = sampling.decompose([obj.matrix_world for obj in objs], rotation)
+            writer.write([obj.name for obj in objs], bpy.context.scene.frame_current, rows)
         return {"FINISHED"}
 
     def invoke(self, context, event):
@@ -391,31 +433,30 @@ class SaveVerticesPositionsOfMesh(bpy.types.Operator):
     filepath = bpy.props.StringProperty(subtype="FILE_PATH")
 
     # main
+    @profiling.profiled
     def execute(self, context):
         obj = bpy.context.active_object
         if obj.type == "MESH":
             if bpy.app.version >= (2, 80, 0):
                 hide_initial = obj.hide_viewport
                 obj.hide_viewport = False
-                depsgraph = bpy.context.evaluated_depsgraph_get()
-                ob_eval = obj.evaluated_get(depsgraph)
-                mesh = ob_eval.to_mesh()
-                mesh.transform(ob_eval.matrix_world) # apply modifiers with preview settings
+                co = sampling.evaluated_vertices(context, obj)
                 obj.hide_viewport = hide_initial
             else:
-                mesh = obj.to_mesh(bpy.context.scene, True, 'PREVIEW')
-                mesh.transform(obj.matrix_world)
-            verts = [vert.co for vert in mesh.vertices]
+                co = sampling.evaluated_vertices(context, obj)
         elif obj.type == "CURVE":
             if bpy.app.version >= (2, 80, 0):
                 verts = [(obj.matrix_world @ Vector(p.co[:3])) for p in obj.data.splines[0].points]
             else:
                 verts = [(obj.matrix_world * Vector(p.co[:3])) for p in obj.data.splines[0].points]
+            co = np.array(verts, dtype=np.float64).reshape(-1, 3)
         else:
             raise Exception("Unsupported type: {}.".format(obj.type))
-        with open(self.filepath, "w", encoding="utf-8") as f:
-            for v in verts[::-1]:
-                f.write(str(v[0]) + "," + str(v[1]) + "," + str(v[2]) + "\n")
+        file_format = context.scene.save_keyframes_file_format
+        filepath = formats.output_path(self.filepath, file_format, context.scene.save_keyframes_gzip)
+        with open_writer(context.scene, filepath, file_format, formats.VERTEX_COLUMNS,
+                         keyed=False) as writer:
+            writer.write(None, None, co[::-1])
         return {"FINISHED"}
 
     def invoke(self, context, event):
@@ -424,40 +465,35 @@ class SaveVerticesPositionsOfMesh(bpy.types.Operator):
         return {'RUNNING_MODAL'}
 
 
-class SaveMeshAnimationVertices(bpy.types.Operator):
+class SaveMeshAnimationVertices(modal.ModalExport, bpy.types.Operator):
 
     bl_idname = "object.save_mesh_animation_vertices"
     bl_label = "save vertices positions of mesh animation"
     bl_description = "Save vertices\' positions of active mesh."
     bl_options = {"REGISTER", "UNDO"}
     filepath = bpy.props.StringProperty(subtype="FILE_PATH")
+    end_frame = bpy.props.IntProperty(name="end frame", default=250)
 
-    # main
-    def execute(self, context):
+    # main, see modal.ModalExport
+    def export(self, context):
         obj = bpy.context.active_object
         if obj.type != "MESH":
             raise Exception("Unsupported type: {}.".format(obj.type))
 
-        if bpy.app.version >= (2, 80, 0):
-            hide_initial = obj.hide_viewport
-            obj.hide_viewport = False
-        with open(self.filepath, "w", encoding="utf-8") as f:
-            for frame in range(bpy.context.scene.frame_current, 251):
-                bpy.context.scene.frame_set(frame)
-                if bpy.app.version >= (2, 80, 0):
-                    depsgraph = bpy.context.evaluated_depsgraph_get()
-                    ob_eval = obj.evaluated_get(depsgraph)
-                    mesh = ob_eval.to_mesh()
-                    mesh.transform(ob_eval.matrix_world) # apply modifiers with preview settings
-                else:
-                    mesh = obj.to_mesh(bpy.context.scene, True, 'PREVIEW')
-                    mesh.transform(obj.matrix_world) # apply modifiers with preview settings
-                verts = [vert.co for vert in mesh.vertices]
-                for i, v in enumerate(verts[::-1]):
-                    f.write("OBJ_" + ("000000" + str(i+1))[-6:] + "," + str(frame) + "," + str(v[0]) + "," + str(v[1]) + "," + str(v[2]) + ",0,0,0,1.0,1.0,1.0\n")
-        if bpy.app.version >= (2, 80, 0):
-            obj.hide_viewport = hide_initial
-        return {"FINISHED"}
+        frames = range(bpy.context.scene.frame_current, self.end_frame + 1)
+        file_format = context.scene.save_keyframes_file_format
+        filepath = formats.output_path(self.filepath, file_format, context.scene.save_keyframes_gzip)
+        if context.scene.save_keyframes_workers > 1:
+            yield from shards.export_sharded(context, "mesh_animation_vertices", frames, 1, filepath,
+                                             ["--active=" + obj.name], report=self.report)
+            return
+        yield from export_mesh_animation(context, [obj], ["OBJ"], frames, filepath, file_format)
+
+    def draw(self, context):
+        col = self.layout.column(align=True)
+        col.prop(self, "end_frame")
+        draw_file_format(col, context)
+        draw_sampling_options(col, context, workers=True)
 
     def invoke(self, context, event):
         self.filepath = ".csv"
@@ -472,8 +508,13 @@ class SaveUVMapOfMesh(bpy.types.Operator):
     bl_description = "Save uv vertices\' positions of active mesh."
     bl_options = {"REGISTER", "UNDO"}
     filepath = bpy.props.StringProperty(subtype="FILE_PATH")
+    all_uv_layers = bpy.props.BoolProperty(
+        name="all uv layers",
+        description="Save every uv layer of the mesh, two columns per layer, instead of the active one.",
+        default=False)
 
     # main
+    @profiling.profiled
     def execute(self, context):
         obj = bpy.context.active_object
         if obj.type == "MESH":
@@ -482,34 +523,34 @@ class SaveUVMapOfMesh(bpy.types.Operator):
                 obj.hide_viewport = False
                 depsgraph = bpy.context.evaluated_depsgraph_get()
                 ob_eval = obj.evaluated_get(depsgraph)
-                mesh = ob_eval.to_mesh()
-                mesh.transform(ob_eval.matrix_world)  # apply modifiers with preview settings
+                with profiling.phase("to_mesh"):
+                    mesh = ob_eval.to_mesh()  # apply modifiers with preview settings
             else:
-                mesh = obj.to_mesh(bpy.context.scene, True, 'PREVIEW')
-                mesh.transform(obj.matrix_world)  # apply modifiers with preview settings
-            uv_layer = obj.data.uv_layers.active.data
-            uv_pos = {}
-            for lo in mesh.loops:
-                p = [str(v) for v in mesh.vertices[lo.vertex_index].co]
-                p = ",".join(p)
-                if p not in uv_pos:
-                    uv_pos[p] = uv_layer[lo.index].uv
-                else:
-                    if uv_pos[p][1] == uv_layer[lo.index].uv[1]:
-                        if uv_pos[p][0] > uv_layer[lo.index].uv[0]:
-                            uv_pos[p] = uv_layer[lo.index].uv
-                    elif uv_pos[p][1] < uv_layer[lo.index].uv[1]:
-                            uv_pos[p] = uv_layer[lo.index].uv
-
-            verts = [",".join([str(vert.co[0]), str(vert.co[1]), str(vert.co[2])]) for vert in mesh.vertices]
+                with profiling.phase("to_mesh"):
+                    mesh = obj.to_mesh(bpy.context.scene, True, 'PREVIEW')  # apply modifiers with preview settings
+            # one row per vertex, of every uv layer the topmost uv of the
+            # loops of the vertex
+            if self.all_uv_layers:
+                uv_layers = list(mesh.uv_layers)
+                columns = formats.uv_columns([uv_layer.name for uv_layer in uv_layers])
+            else:
+                uv_layers = [mesh.uv_layers.active]
+                columns = formats.UV_COLUMNS
+            with profiling.phase("uvs"):
+                uvs = np.hstack([sampling.vertex_uvs(mesh, uv_layer) for uv_layer in uv_layers])
+            # free the evaluated mesh
             if bpy.app.version >= (2, 80, 0):
+                ob_eval.to_mesh_clear()
                 obj.hide_viewport = hide_initial
+            else:
+                bpy.data.meshes.remove(mesh)
         else:
             raise Exception("Unsupported type: {}.".format(obj.type))
 
-        with open(self.filepath, "w", encoding="utf-8") as f:
-            for v in verts[::-1]:
-                f.write(str(uv_pos[v][0]) + "," + str(uv_pos[v][1]) + "\n")
+        file_format = context.scene.save_keyframes_file_format
+        filepath = formats.output_path(self.filepath, file_format, context.scene.save_keyframes_gzip)
+        with open_writer(context.scene, filepath, file_format, columns, keyed=False) as writer:
+            writer.write(None, None, uvs[::-1])
         return {"FINISHED"}
 
     def invoke(self, context, event):
@@ -577,6 +618,23 @@ def register():
             name="id key (regular expression)",
             description="select object only which matches to this expression.",
             default="")
+    bpy.types.Scene.save_keyframes_collection\
+        = bpy.props.StringProperty(
+            name="collection",
+            description="Only objects of this collection or of its children, every object if empty.",
+            default="")
+    bpy.types.Scene.save_keyframes_object_types\
+        = bpy.props.EnumProperty(
+            name="object types",
+            description="Only objects of these types, every type if none is set.",
+            items=selection.object_types(),
+            options={"ENUM_FLAG"},
+            default=set())
+    bpy.types.Scene.save_keyframes_animated_only\
+        = bpy.props.BoolProperty(
+            name="animated only",
+            description="Only objects which move, or meshes which deform, over the frames.",
+            default=False)
     bpy.types.Scene.save_keyframes_start_frame\
         = bpy.props.IntProperty(
             name="start frame",
@@ -592,19 +650,148 @@ def register():
     bpy.types.Scene.save_keyframes_file_name\
         = bpy.props.StringProperty(
             name="export file name",
-            description="Csv file name to save.",
+            description="Csv file name to save, relative to the .blend file or absolute.",
             default="keyframes")
+    bpy.types.Scene.save_keyframes_file_format\
+        = bpy.props.EnumProperty(
+            name="export file format",
+            description="Format of the file to save.",
+            items=formats.FILE_FORMATS,
+            default="CSV")
+    bpy.types.Scene.save_keyframes_gzip\
+        = bpy.props.BoolProperty(
+            name="gzip",
+            description="Compress csv files with gzip while they are written, the file name ends with .csv.gz.",
+            default=False)
+    bpy.types.Scene.save_keyframes_fixed\
+        = bpy.props.BoolProperty(
+            name="fixed decimals",
+            description="Write csv values rounded to a fixed number of decimals instead of every digit.",
+            default=False)
+    bpy.types.Scene.save_keyframes_decimals\
+        = bpy.props.IntProperty(
+            name="decimals",
+            description="Decimals of the csv values.",
+            default=6,
+            min=0,
+            max=17)
+    bpy.types.Scene.save_keyframes_rotation\
+        = bpy.props.EnumProperty(
+            name="rotation",
+            description="Rotation columns of the transform rows.",
+            items=sampling.ROTATIONS,
+            default="EULER")
+    bpy.types.Scene.save_keyframes_adaptive\
+        = bpy.props.BoolProperty(
+            name="adaptive",
+            description="Save only the frames needed to interpolate the motion linearly within the tolerances.",
+            default=False)
+    bpy.types.Scene.save_keyframes_position_tolerance\
+        = bpy.props.FloatProperty(
+            name="position tolerance",
+            description="Largest distance of interpolated locations (and scales) from the exact ones.",
+            default=0.01,
+            min=1e-6,
+            precision=4)
+    bpy.types.Scene.save_keyframes_rotation_tolerance\
+        = bpy.props.FloatProperty(
+            name="rotation tolerance",
+            description="Largest difference of interpolated rotations from the exact ones: of each euler angle, the quaternion angle or the length of each matrix column.",
+            default=0.0174533,
+            min=1e-6,
+            subtype="ANGLE")
+    bpy.types.Scene.save_keyframes_precision\
+        = bpy.props.FloatProperty(
+            name="delta precision",
+            description="Values of the delta format are rounded to multiples of this step.",
+            default=formats.DELTA_PRECISION,
+            min=1e-9,
+            precision=6)
+    bpy.types.Scene.save_keyframes_codec\
+        = bpy.props.EnumProperty(
+            name="delta compression",
+            description="Compression of the delta format.",
+            items=formats.CODEC_ITEMS,
+            default="ZLIB")
+    bpy.types.Scene.save_keyframes_isolate\
+        = bpy.props.BoolProperty(
+            name="isolate",
+            description="Set the frames of a temporary scene holding only the exported objects and the objects they depend on.",
+            default=False)
+    bpy.types.Scene.save_keyframes_modal\
+        = bpy.props.BoolProperty(
+            name="run in background",
+            description="Export from a timer, with the progress in the status bar. Esc cancels, keeping the frames written so far.",
+            default=False)
+    bpy.types.Scene.save_keyframes_workers\
+        = bpy.props.IntProperty(
+            name="workers",
+            description="Background blender processes exporting shards of the frames, 1 exports in this process.",
+            default=1,
+            min=1)
+    bpy.types.Scene.save_keyframes_worker_retries\
+        = bpy.props.IntProperty(
+            name="worker retries",
+            description="Times a failed worker is started again.",
+            default=1,
+            min=0)
+    bpy.types.Scene.save_keyframes_use_cache\
+        = bpy.props.BoolProperty(
+            name="use cache",
+            description="Read rows of unchanged objects from the cache of previous exports next to the .blend file.",
+            default=False)
+    bpy.types.Scene.save_keyframes_cache_size\
+        = bpy.props.IntProperty(
+            name="cache size (MB)",
+            description="Least recently used cache entries are removed over this size.",
+            default=1024,
+            min=1)
+    bpy.types.Scene.save_keyframes_profile\
+        = bpy.props.BoolProperty(
+            name="profile",
+            description="Report the time of every phase of the export, the rows and bytes written and the peak memory.",
+            default=False)
+    bpy.types.Scene.save_keyframes_profile_json\
+        = bpy.props.BoolProperty(
+            name="profile json",
+            description="Also write the profile to <export file>.profile.json.",
+            default=False)
+    selection.register()
+    modal.register()
     register_shortcut()
 
 
 def unregister():
+    modal.unregister()
+    selection.unregister()
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
     bpy.types.VIEW3D_MT_object_animation.remove(menu_func)
     del bpy.types.Scene.save_keyframes_id_key
+    del bpy.types.Scene.save_keyframes_collection
+    del bpy.types.Scene.save_keyframes_object_types
+    del bpy.types.Scene.save_keyframes_animated_only
     del bpy.types.Scene.save_keyframes_start_frame
     del bpy.types.Scene.save_keyframes_end_frame
     del bpy.types.Scene.save_keyframes_file_name
+    del bpy.types.Scene.save_keyframes_file_format
+    del bpy.types.Scene.save_keyframes_gzip
+    del bpy.types.Scene.save_keyframes_fixed
+    del bpy.types.Scene.save_keyframes_decimals
+    del bpy.types.Scene.save_keyframes_rotation
+    del bpy.types.Scene.save_keyframes_adaptive
+    del bpy.types.Scene.save_keyframes_position_tolerance
+    del bpy.types.Scene.save_keyframes_rotation_tolerance
+    del bpy.types.Scene.save_keyframes_precision
+    del bpy.types.Scene.save_keyframes_codec
+    del bpy.types.Scene.save_keyframes_isolate
+    del bpy.types.Scene.save_keyframes_modal
+    del bpy.types.Scene.save_keyframes_workers
+    del bpy.types.Scene.save_keyframes_worker_retries
+    del bpy.types.Scene.save_keyframes_use_cache
+    del bpy.types.Scene.save_keyframes_cache_size
+    del bpy.types.Scene.save_keyframes_profile
+    del bpy.types.Scene.save_keyframes_profile_json
 
 
 if __name__ == "__main__":
@@ -0,0 +1,32 @@
+"""
+command line entry point, see cli.py:
+
+    blender -b shot.blend --python path/to/add-on/__main__.py -- --exporter animations ...
+"""
+
+import importlib.util
+import os
+import sys
+
+
+def load_package():
+    # blender runs this file as a script, import the add-on by its directory
+    root = os.path.dirname(os.path.abspath(__file__))
+    name = os.path.basename(root)
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            name, os.path.join(root, "__init__.py"), submodule_search_locations=[root])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return importlib.import_module(name + ".cli")
+
+
+if __name__ == "__main__":
+    if __package__:
+        from .cli import main
+    else:
+        main = load_package().main
+    status = main()
+    if status:
+        sys.exit(status)
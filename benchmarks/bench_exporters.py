@@ -0,0 +1,177 @@
+"""
+throughput of every exporter on synthetic scenes, without blender.
+
+bpy and mathutils are replaced by benchmarks/fake_bpy.py, so the numbers
+measure the add-on itself (sampling, formatting, writing), not depsgraph
+evaluation. frame_set counts are exact and comparable to a real scene.
+
+    python benchmarks/bench_exporters.py --objects 100 --frames 250 --vertices 2000
+    python benchmarks/bench_exporters.py --report bench.json --compare baseline.json
+
+every exporter runs once for timing and once under tracemalloc for the peak
+memory. --compare exits with 1 when rows/s dropped more than --tolerance or
+frame_set calls grew against a previous --report.
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, BENCHMARKS)
+
+import fake_bpy  # noqa: E402
+
+bpy = fake_bpy.install()
+
+# exporter: (options of the cli job, mesh exporter)
+JOBS = {
+    "keyframes": (["--id-key", "^UAV"], False),
+    "animations": (["--id-key", "^UAV", "--select"], False),
+    "animations_of_mesh": (["--id-key", "^MESH"], True),
+    "material_keyframes": (["--id-key", "^UAV", "--select"], False),
+    "selection_positions": (["--id-key", "^UAV", "--select"], False),
+    "vertices_positions_of_mesh": (["--active", "MESH_000000"], True),
+    "mesh_animation_vertices": (["--active", "MESH_000000"], True),
+    "uv_map_of_mesh": (["--active", "MESH_000000"], True),
+}
+
+
+def load_addon():
+    spec = importlib.util.spec_from_file_location(
+        "save_object_keyframes", os.path.join(ROOT, "__init__.py"),
+        submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    importlib.import_module(spec.name + ".cli")
+    return module
+
+
+def build_scene(directory, args):
+    # animated empties with materials, meshes parented to the first empty
+    context = fake_bpy.new_context(directory)
+    scene = context.scene
+    scene.frame_start = 1
+    scene.frame_end = args.frames
+    for i in range(args.objects):
+        obj = fake_bpy.animated_empty("UAV_{:06d}".format(i), args.keys, args.frames, seed=i)
+        obj.active_material = fake_bpy.animated_material("UAV_{:06d}Material".format(i),
+                                                         args.keys, args.frames, seed=i)
+        scene.link(obj)
+    for i in range(args.meshes):
+        obj = fake_bpy.grid_mesh_object("MESH_{:06d}".format(i), args.vertices, seed=i)
+        if args.objects:
+            obj.parent = scene.objects[0]
+        scene.link(obj)
+    return context
+
+
+def output_rows(addon, path, file_format):
+    if file_format == "BINARY":
+        return addon.formats.read_columnar(path)["rows"]
+    if file_format == "DELTA":
+        return addon.formats.read_delta(path)["rows"]
+    with open(path, "rb") as f:
+        return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+
+
+def run(addon, exporter, args, file_format, measure_memory):
+    options, mesh = JOBS[exporter]
+    frames = args.mesh_frames if mesh else args.frames
+    argv = ["--exporter", exporter, "--start", "1", "--end", str(frames),
+            "--interval", str(args.interval), "--format", file_format,
+            "--output", "//" + exporter] + options
+    job = addon.cli.job_of(addon.cli.parser().parse_args(argv))
+    with tempfile.TemporaryDirectory() as directory:
+        context = build_scene(directory, args)
+        gc.collect()
+        if measure_memory:
+            tracemalloc.start()
+        record = addon.cli.run_job(job)
+        if measure_memory:
+            record["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        if record["status"] != "FINISHED":
+            raise Exception("{} failed:\n{}".format(exporter, record["error"]))
+        record["rows"] = output_rows(addon, record["output"], file_format)
+        record["frame_set"] = context.scene.frame_set_calls
+    return record
+
+
+def compare(results, baseline, tolerance):
+    # messages of the regressions of results against baseline
+    previous = {(r["exporter"], r["format"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["exporter"], result["format"]))
+        if before is None:
+            continue
+        if result["rows_per_s"] < before["rows_per_s"] * (1.0 - tolerance):
+            regressions.append("{} {}: {:.0f} rows/s, was {:.0f}".format(
+                result["exporter"], result["format"], result["rows_per_s"], before["rows_per_s"]))
+        if result["frame_set"] > before["frame_set"]:
+            regressions.append("{} {}: {} frame_set calls, was {}".format(
+                result["exporter"], result["format"], result["frame_set"], before["frame_set"]))
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--objects", type=int, default=50, help="animated empties")
+    parser.add_argument("--frames", type=int, default=250)
+    parser.add_argument("--keys", type=int, default=10, help="keyframes per f-curve")
+    parser.add_argument("--meshes", type=int, default=2)
+    parser.add_argument("--vertices", type=int, default=1000, help="vertices per mesh")
+    parser.add_argument("--mesh-frames", type=int, default=50, help="frames of the mesh exporters")
+    parser.add_argument("--interval", type=int, default=1)
+    parser.add_argument("--formats", nargs="+", default=["CSV", "BINARY", "DELTA"])
+    parser.add_argument("--exporters", nargs="+", choices=sorted(JOBS), default=list(JOBS))
+    parser.add_argument("--report", help="write the results to this json file")
+    parser.add_argument("--compare", help="json report of a previous run")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative drop of rows/s against --compare")
+    args = parser.parse_args(argv)
+
+    addon = load_addon()
+    results = []
+    print("exporter,format,rows,seconds,rows_per_s,bytes_per_s,peak_mb,frame_set")
+    for exporter in args.exporters:
+        for file_format in args.formats:
+            record = run(addon, exporter, args, file_format, False)
+            peak = run(addon, exporter, args, file_format, True)["peak_bytes"]
+            result = {
+                "exporter": exporter,
+                "format": file_format,
+                "rows": record["rows"],
+                "bytes": record["bytes"],
+                "seconds": record["seconds"],
+                "rows_per_s": record["rows"] / record["seconds"],
+                "bytes_per_s": record["bytes"] / record["seconds"],
+                "peak_bytes": peak,
+                "frame_set": record["frame_set"],
+            }
+            results.append(result)
+            print("{},{},{},{:.3f},{:.0f},{:.0f},{:.1f},{}".format(
+                exporter, file_format, result["rows"], result["seconds"], result["rows_per_s"],
+                result["bytes_per_s"], peak / (1 << 20), result["frame_set"]))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"options": vars(args), "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for message in regressions:
+            print("regression: " + message, file=sys.stderr)
+        return int(bool(regressions))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
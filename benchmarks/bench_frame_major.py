@@ -0,0 +1,102 @@
+"""
+compare object-major and frame-major sampling of matrix_world.
+
+the objects are parented to an animated root, so their transforms come from
+the depsgraph and every frame is set. unparented, they are keyframe driven
+and sampled from their f-curves without frame_set (analytic_s).
+
+run inside blender:
+    blender -b --factory-startup --python benchmarks/bench_frame_major.py -- --objects 10 50 100 500 --frames 250
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+import bpy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_addon():
+    spec = importlib.util.spec_from_file_location(
+        "save_object_keyframes", os.path.join(ROOT, "__init__.py"),
+        submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_scene(n_objects, n_frames):
+    # returns the scene, the animated root and the objects parented to it
+    scene = bpy.context.scene
+    root = bpy.data.objects.new("ROOT", None)
+    scene.collection.objects.link(root)
+    root.location = (0, 0, 0)
+    root.keyframe_insert("location", frame=1)
+    root.location = (0, 0, 1)
+    root.keyframe_insert("location", frame=n_frames)
+    objs = []
+    for i in range(n_objects):
+        obj = bpy.data.objects.new("UAV_{:06d}".format(i), None)
+        scene.collection.objects.link(obj)
+        obj.parent = root
+        for frame in range(1, n_frames + 1, 10):
+            obj.location = (i, frame * 0.1, (i * frame) % 7)
+            obj.rotation_euler = (0, 0, frame * 0.01)
+            obj.keyframe_insert("location", frame=frame)
+            obj.keyframe_insert("rotation_euler", frame=frame)
+        objs.append(obj)
+    return scene, root, objs
+
+
+def object_major(scene, objs, frames, sampling):
+    rows = 0
+    for obj in objs:
+        for frame in frames:
+            scene.frame_set(frame)
+            sampling.decompose([obj.matrix_world])
+            rows += 1
+    return rows
+
+
+def frame_major(scene, objs, frames, sampling):
+    rows = 0
+    for frame, sampled in sampling.sample_transforms(scene, objs, frames):
+        rows += len(sampled)
+    return rows
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--objects", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--frames", type=int, default=250)
+    args = parser.parse_args(argv)
+
+    sampling = load_addon().sampling
+    print("objects,frames,object_major_s,frame_major_s,speedup,analytic_s")
+    for n_objects in args.objects:
+        scene, root, objs = build_scene(n_objects, args.frames)
+        frames = sampling.export_frames(1, args.frames, 1)
+        t = time.perf_counter()
+        object_major(scene, objs, frames, sampling)
+        t_object = time.perf_counter() - t
+        t = time.perf_counter()
+        frame_major(scene, objs, frames, sampling)
+        t_frame = time.perf_counter() - t
+        for obj in objs:
+            obj.parent = None
+        t = time.perf_counter()
+        frame_major(scene, objs, frames, sampling)
+        t_analytic = time.perf_counter() - t
+        print("{},{},{:.3f},{:.3f},{:.1f}x,{:.3f}".format(
+            n_objects, args.frames, t_object, t_frame, t_object / t_frame, t_analytic))
+        for obj in objs + [root]:
+            bpy.data.objects.remove(obj)
+
+
+if __name__ == "__main__":
+    main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [])
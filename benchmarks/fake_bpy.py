@@ -0,0 +1,724 @@
+"""
+lightweight stand-in for the parts of bpy/mathutils used by the add-on.
+
+install() registers `bpy` and `mathutils` in sys.modules so the add-on can be
+imported and its operators executed on a plain python install. scenes are
+synthetic: objects are animated by linear f-curves, meshes are deformed by a
+per-frame wave modifier, and every frame_set() re-evaluates every object of the scene
+like a real depsgraph update does.
+"""
+
+import math
+import os
+import sys
+import types
+
+
+# mathutils
+
+class Vector(tuple):
+
+    def __new__(cls, seq=(0.0, 0.0, 0.0)):
+        return super().__new__(cls, [float(v) for v in seq])
+
+    @property
+    def x(self):
+        return self[0]
+
+    @property
+    def y(self):
+        return self[1]
+
+    @property
+    def z(self):
+        return self[2]
+
+    @property
+    def length(self):
+        return math.sqrt(sum(v * v for v in self))
+
+    def __add__(self, other):
+        return Vector(a + b for a, b in zip(self, other))
+
+    def __sub__(self, other):
+        return Vector(a - b for a, b in zip(self, other))
+
+
+class Euler(Vector):
+
+    def __new__(cls, seq=(0.0, 0.0, 0.0), order="XYZ"):
+        self = super().__new__(cls, seq)
+        self.order = order
+        return self
+
+    def to_matrix(self):
+        x, y, z = self
+        cx, sx = math.cos(x), math.sin(x)
+        cy, sy = math.cos(y), math.sin(y)
+        cz, sz = math.cos(z), math.sin(z)
+        # XYZ euler: R = Rz @ Ry @ Rx
+        return Matrix((
+            (cy * cz, sx * sy * cz - cx * sz, cx * sy * cz + sx * sz),
+            (cy * sz, sx * sy * sz + cx * cz, cx * sy * sz - sx * cz),
+            (-sy, sx * cy, cx * cy)))
+
+
+class Quaternion(Vector):
+    pass
+
+
+class Matrix(tuple):
+
+    def __new__(cls, rows=None):
+        if rows is None:
+            rows = [[float(i == j) for j in range(4)] for i in range(4)]
+        return super().__new__(cls, [Vector(r) for r in rows])
+
+    def copy(self):
+        return Matrix(self)
+
+    @classmethod
+    def Identity(cls, size):
+        return cls([[float(i == j) for j in range(size)] for i in range(size)])
+
+    @classmethod
+    def Translation(cls, v):
+        m = [[float(i == j) for j in range(4)] for i in range(4)]
+        for i in range(3):
+            m[i][3] = float(v[i])
+        return cls(m)
+
+    @classmethod
+    def Diagonal(cls, v):
+        return cls([[float(v[i]) if i == j else 0.0 for j in range(len(v))]
+                    for i in range(len(v))])
+
+    @classmethod
+    def LocRotScale(cls, loc, rot, scale):
+        r = rot.to_matrix() if hasattr(rot, "to_matrix") else rot
+        m = [[r[i][j] * scale[j] for j in range(3)] + [loc[i]] for i in range(3)]
+        return cls(m + [[0.0, 0.0, 0.0, 1.0]])
+
+    def to_4x4(self):
+        if len(self) == 4:
+            return self
+        return Matrix([list(r) + [0.0] for r in self] + [[0.0, 0.0, 0.0, 1.0]])
+
+    def __matmul__(self, other):
+        if isinstance(other, Matrix):
+            n = len(other[0])
+            return Matrix([[sum(self[i][k] * other[k][j] for k in range(len(other)))
+                            for j in range(n)] for i in range(len(self))])
+        v = list(other) + [1.0] * (len(self) - len(other))
+        out = [sum(self[i][k] * v[k] for k in range(len(self))) for i in range(len(self))]
+        return Vector(out[:len(other)])
+
+    __mul__ = __matmul__
+
+    def to_translation(self):
+        return Vector((self[0][3], self[1][3], self[2][3]))
+
+    def to_scale(self):
+        return Vector(math.sqrt(self[0][j] ** 2 + self[1][j] ** 2 + self[2][j] ** 2)
+                      for j in range(3))
+
+    def to_euler(self):
+        # mat3_normalized_to_eul of blenlib, mat[i][j] is column i, row j
+        sca = self.to_scale()
+        m = [[self[j][i] / (sca[i] or 1.0) for j in range(3)] for i in range(3)]
+        cy = math.hypot(m[0][0], m[0][1])
+        if cy > 16.0 * 1.1920929e-07:
+            e1 = (math.atan2(m[1][2], m[2][2]), math.atan2(-m[0][2], cy),
+                  math.atan2(m[0][1], m[0][0]))
+            e2 = (math.atan2(-m[1][2], -m[2][2]), math.atan2(-m[0][2], -cy),
+                  math.atan2(-m[0][1], -m[0][0]))
+        else:
+            e1 = (math.atan2(-m[2][1], m[1][1]), math.atan2(-m[0][2], cy), 0.0)
+            e2 = e1
+        if sum(map(abs, e1)) > sum(map(abs, e2)):
+            e1 = e2
+        return Euler(e1)
+
+    def to_quaternion(self):
+        sca = self.to_scale()
+        m = [[self[i][j] / (sca[j] or 1.0) for j in range(3)] for i in range(3)]
+        tr = m[0][0] + m[1][1] + m[2][2]
+        if tr > 0:
+            s = math.sqrt(tr + 1.0) * 2
+            q = (0.25 * s, (m[2][1] - m[1][2]) / s, (m[0][2] - m[2][0]) / s, (m[1][0] - m[0][1]) / s)
+        elif m[0][0] > m[1][1] and m[0][0] > m[2][2]:
+            s = math.sqrt(1.0 + m[0][0] - m[1][1] - m[2][2]) * 2
+            q = ((m[2][1] - m[1][2]) / s, 0.25 * s, (m[0][1] + m[1][0]) / s, (m[0][2] + m[2][0]) / s)
+        elif m[1][1] > m[2][2]:
+            s = math.sqrt(1.0 + m[1][1] - m[0][0] - m[2][2]) * 2
+            q = ((m[0][2] - m[2][0]) / s, (m[0][1] + m[1][0]) / s, 0.25 * s, (m[1][2] + m[2][1]) / s)
+        else:
+            s = math.sqrt(1.0 + m[2][2] - m[0][0] - m[1][1]) * 2
+            q = ((m[1][0] - m[0][1]) / s, (m[0][2] + m[2][0]) / s, (m[1][2] + m[2][1]) / s, 0.25 * s)
+        return Quaternion(q)
+
+
+# bpy.props / bpy.types
+
+def _prop(default):
+    def factory(**kwargs):
+        return kwargs.get("default", default)
+    return factory
+
+
+props = types.SimpleNamespace(
+    StringProperty=_prop(""),
+    IntProperty=_prop(0),
+    FloatProperty=_prop(0.0),
+    BoolProperty=_prop(False),
+    EnumProperty=_prop(None),
+    PointerProperty=_prop(None),
+)
+
+
+class Operator:
+
+    def __init__(self):
+        self.reports = []
+
+    def report(self, level, message):
+        self.reports.append((level, message))
+
+
+class _Collection(list):
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            for item in self:
+                if item.name == key:
+                    return item
+            raise KeyError(key)
+        return super().__getitem__(key)
+
+    def foreach_get(self, attr, buf):
+        i = 0
+        for item in self:
+            value = getattr(item, attr)
+            if isinstance(value, (tuple, list)):
+                for v in value:
+                    buf[i] = v
+                    i += 1
+            else:
+                buf[i] = value
+                i += 1
+
+    def items(self):
+        return [(item.name, item) for item in self]
+
+    def get(self, name, default=None):
+        for item in self:
+            if item.name == name:
+                return item
+        return default
+
+
+class Keyframe:
+
+    def __init__(self, frame, value):
+        self.co = Vector((frame, value))
+        self.handle_left = Vector((frame - 1.0, value))
+        self.handle_right = Vector((frame + 1.0, value))
+        self.interpolation = "LINEAR"
+        self.easing = "AUTO"
+
+
+class FCurve:
+
+    def __init__(self, data_path, array_index, keys):
+        self.data_path = data_path
+        self.array_index = array_index
+        self.keyframe_points = _Collection(Keyframe(f, v) for f, v in keys)
+        self.modifiers = _Collection()
+        self.mute = False
+        self.extrapolation = "CONSTANT"
+
+    def evaluate(self, frame):
+        points = self.keyframe_points
+        if frame <= points[0].co[0]:
+            return points[0].co[1]
+        for a, b in zip(points, points[1:]):
+            if frame <= b.co[0]:
+                t = (frame - a.co[0]) / (b.co[0] - a.co[0])
+                return a.co[1] + (b.co[1] - a.co[1]) * t
+        return points[-1].co[1]
+
+
+class Action:
+
+    def __init__(self, name, fcurves):
+        self.name = name
+        self.fcurves = _Collection(fcurves)
+
+
+class AnimData:
+
+    def __init__(self, action):
+        self.action = action
+        self.drivers = _Collection()
+        self.nla_tracks = _Collection()
+
+
+class Vertex:
+
+    __slots__ = ("index", "co")
+
+    def __init__(self, index, co):
+        self.index = index
+        self.co = co
+
+
+class Loop:
+
+    __slots__ = ("index", "vertex_index")
+
+    def __init__(self, index, vertex_index):
+        self.index = index
+        self.vertex_index = vertex_index
+
+
+class UVLoop:
+
+    __slots__ = ("uv",)
+
+    def __init__(self, uv):
+        self.uv = uv
+
+
+class UVLayer:
+
+    def __init__(self, name, uvs):
+        self.name = name
+        self.data = _Collection(UVLoop(Vector(uv)) for uv in uvs)
+
+
+class UVLayers(_Collection):
+
+    @property
+    def active(self):
+        return self[0] if self else None
+
+
+class _Property:
+
+    def __init__(self, identifier, type):
+        self.identifier = identifier
+        self.type = type
+
+
+class Modifier:
+
+    bl_rna = types.SimpleNamespace(properties=[_Property("name", "STRING"), _Property("type", "ENUM")])
+
+    def __init__(self, name, type):
+        self.name = name
+        self.type = type
+
+
+class ID:
+    pass
+
+
+class Mesh(ID):
+
+    bl_rna = types.SimpleNamespace(properties=[_Property("name", "STRING")])
+
+    def __init__(self, name, coords, loops=(), uv_layers=()):
+        self.name = name
+        self.vertices = _Collection(Vertex(i, Vector(co)) for i, co in enumerate(coords))
+        self.loops = _Collection(Loop(i, v) for i, v in enumerate(loops))
+        self.uv_layers = UVLayers(uv_layers)
+        self.edges = _Collection()
+        self.polygons = _Collection()
+        self.shape_keys = None
+
+    def transform(self, matrix):
+        for vert in self.vertices:
+            vert.co = matrix @ vert.co
+
+    def copy_deformed(self, frame):
+        wave = 0.01 * math.sin(frame * 0.1)
+        mesh = Mesh.__new__(Mesh)
+        mesh.name = self.name
+        mesh.vertices = _Collection(
+            Vertex(v.index, Vector((v.co[0], v.co[1], v.co[2] + wave * v.co[0])))
+            for v in self.vertices)
+        mesh.loops = self.loops
+        mesh.uv_layers = self.uv_layers
+        mesh.edges = self.edges
+        mesh.polygons = self.polygons
+        mesh.shape_keys = None
+        return mesh
+
+
+class Object(ID):
+
+    bl_rna = types.SimpleNamespace(properties={"type": types.SimpleNamespace(enum_items=[
+        types.SimpleNamespace(identifier=t, name=t.replace("_", " ").title(), description="")
+        for t in ("MESH", "CURVE", "SURFACE", "META", "FONT", "VOLUME", "GPENCIL", "ARMATURE",
+                  "LATTICE", "EMPTY", "LIGHT", "LIGHT_PROBE", "CAMERA", "SPEAKER")])})
+
+    def __init__(self, name, type="EMPTY", data=None):
+        self.name = name
+        self.type = type
+        self.data = data
+        self.parent = None
+        self.animation_data = None
+        self.constraints = _Collection()
+        self.modifiers = _Collection()
+        self.vertex_groups = _Collection()
+        self.location = Vector((0.0, 0.0, 0.0))
+        self.rotation_euler = Euler((0.0, 0.0, 0.0))
+        self.rotation_mode = "XYZ"
+        self.scale = Vector((1.0, 1.0, 1.0))
+        self.delta_location = Vector((0.0, 0.0, 0.0))
+        self.delta_rotation_euler = Euler((0.0, 0.0, 0.0))
+        self.delta_scale = Vector((1.0, 1.0, 1.0))
+        self.rotation_quaternion = Vector((1.0, 0.0, 0.0, 0.0))
+        self.rotation_axis_angle = Vector((0.0, 0.0, 1.0, 0.0))
+        self.delta_rotation_quaternion = Vector((1.0, 0.0, 0.0, 0.0))
+        self.parent_type = "OBJECT"
+        self.matrix_parent_inverse = Matrix()
+        self.particle_systems = _Collection()
+        self.matrix_world = Matrix()
+        self.hide_viewport = False
+        self.select = True
+        self.active_material = None
+        self.users_collection = []
+        self._frame = 0
+        self._meshes_alive = 0
+
+    def select_get(self):
+        return self.select
+
+    def select_set(self, state):
+        self.select = state
+
+    def evaluated_get(self, depsgraph):
+        return self
+
+    def to_mesh(self, *args):
+        # only a wave modifier deforms the mesh over the frames
+        self._meshes_alive += 1
+        waving = any(modifier.type == "WAVE" for modifier in self.modifiers)
+        return self.data.copy_deformed(self._frame if waving else 0)
+
+    def to_mesh_clear(self):
+        self._meshes_alive = 0
+
+    def _channel(self, path, index, base):
+        ad = self.animation_data
+        if ad is not None and ad.action is not None:
+            for fc in ad.action.fcurves:
+                if fc.data_path == path and fc.array_index == index:
+                    return fc.evaluate(self._frame)
+        return base
+
+    def _evaluate(self, frame):
+        self._frame = frame
+        loc = [self._channel("location", i, self.location[i]) for i in range(3)]
+        rot = [self._channel("rotation_euler", i, self.rotation_euler[i]) for i in range(3)]
+        sca = [self._channel("scale", i, self.scale[i]) for i in range(3)]
+        local = Matrix.LocRotScale(loc, Euler(rot), sca)
+        if self.parent is not None:
+            self.parent._evaluate(frame)
+            local = self.parent.matrix_world @ local
+        self.matrix_world = local
+
+
+class Material(ID):
+
+    def __init__(self, name):
+        self.name = name
+        self.animation_data = None
+
+
+class _SceneObjects(_Collection):
+    # objects of the master collection, linking adds them to the scene
+
+    def __init__(self, scene):
+        super().__init__()
+        self.scene = scene
+
+    def link(self, obj):
+        self.scene.link(obj)
+
+
+class _Scenes(_Collection):
+
+    def new(self, name):
+        scene = Scene(name)
+        self.append(scene)
+        return scene
+
+    def remove(self, scene, do_unlink=True):
+        self[:] = [s for s in self if s is not scene]
+
+
+class Collection(ID):
+
+    def __init__(self, name, objects=()):
+        self.name = name
+        self.objects = _Collection(objects)
+        self.children = _Collection()
+        self.all_objects = self.objects
+
+
+class Scene(ID):
+
+    def __init__(self, name="Scene"):
+        self.name = name
+        self.objects = _Collection()
+        self.collection = Collection("Master Collection")
+        self.frame_current = 1
+        self.frame_start = 1
+        self.frame_end = 250
+        self.frame_set_calls = 0
+        self.save_keyframes_id_key = ""
+        self.save_keyframes_collection = ""
+        self.save_keyframes_object_types = set()
+        self.save_keyframes_animated_only = False
+        self.save_keyframes_start_frame = 1
+        self.save_keyframes_end_frame = 250
+        self.save_keyframes_interval = 1
+        self.save_keyframes_file_name = "keyframes"
+        self.save_keyframes_file_format = "CSV"
+        self.save_keyframes_adaptive = False
+        self.save_keyframes_position_tolerance = 0.01
+        self.save_keyframes_rotation_tolerance = 0.0174533
+        self.save_keyframes_precision = 1e-4
+        self.save_keyframes_codec = "ZLIB"
+        self.save_keyframes_modal = False
+        self.save_keyframes_workers = 1
+        self.save_keyframes_worker_retries = 1
+        self.save_keyframes_use_cache = False
+        self.save_keyframes_cache_size = 1024
+        self.save_keyframes_profile = False
+        self.save_keyframes_profile_json = False
+        self.save_keyframes_gzip = False
+        self.save_keyframes_isolate = False
+        self.save_keyframes_rotation = "EULER"
+        self.save_keyframes_fixed = False
+        self.save_keyframes_decimals = 6
+        self.render = types.SimpleNamespace(use_simplify=False, simplify_subdivision=6, fps=24, fps_base=1.0)
+        self.view_layers = [types.SimpleNamespace(depsgraph=Depsgraph(self))]
+        self.collection.objects = self.collection.all_objects = _SceneObjects(self)
+
+    def link(self, obj):
+        self.objects.append(obj)
+        list.append(self.collection.objects, obj)
+        obj.users_collection.append(self.collection)
+        obj._evaluate(self.frame_current)
+        for handler in bpy.app.handlers.depsgraph_update_post:
+            handler(self, Depsgraph(self, ("OBJECT", "COLLECTION")))
+
+    def as_pointer(self):
+        return id(self)
+
+    def frame_set(self, frame, subframe=0.0):
+        # a depsgraph update evaluates every object of the scene
+        self.frame_set_calls += 1
+        self.frame_current = frame
+        for obj in self.objects:
+            obj._evaluate(frame)
+
+
+class Depsgraph:
+
+    def __init__(self, scene, updated_types=()):
+        self.scene = scene
+        self.updates = []
+        self.updated_types = set(updated_types)
+
+    def id_type_updated(self, id_type):
+        return id_type in self.updated_types
+
+
+class WindowManager:
+
+    keyconfigs = types.SimpleNamespace(addon=None)
+
+    def __init__(self):
+        self.timers = []
+        self.modal_handlers = []
+
+    def invoke_props_dialog(self, op):
+        return {"RUNNING_MODAL"}
+
+    def event_timer_add(self, time_step, window=None):
+        timer = types.SimpleNamespace(time_step=time_step)
+        self.timers.append(timer)
+        return timer
+
+    def event_timer_remove(self, timer):
+        self.timers.remove(timer)
+
+    def modal_handler_add(self, op):
+        self.modal_handlers.append(op)
+        return True
+
+    def fileselect_add(self, op):
+        return None
+
+
+class Workspace:
+
+    def __init__(self):
+        self.status_text = None
+
+    def status_text_set(self, text):
+        self.status_text = text
+
+
+class Event:
+
+    def __init__(self, type, value="NOTHING"):
+        self.type = type
+        self.value = value
+
+
+class Context:
+
+    def __init__(self, scene):
+        self.scene = scene
+        self.window_manager = WindowManager()
+        self.window = None
+        self.workspace = Workspace()
+        self.view_layer = types.SimpleNamespace(objects=types.SimpleNamespace(active=None))
+
+    @property
+    def active_object(self):
+        return self.view_layer.objects.active
+
+    @active_object.setter
+    def active_object(self, obj):
+        self.view_layer.objects.active = obj
+
+    @property
+    def selected_objects(self):
+        return [o for o in self.scene.objects if o.select]
+
+    def evaluated_depsgraph_get(self):
+        return Depsgraph(self.scene)
+
+
+def _abspath(path):
+    if path.startswith("//"):
+        return os.path.join(os.path.dirname(bpy.data.filepath), path[2:])
+    return path
+
+
+bpy = types.ModuleType("bpy")
+bpy.props = props
+bpy.types = types.SimpleNamespace(
+    Operator=Operator, ID=ID, Object=Object, Collection=Collection, Scene=Scene,
+    Mesh=Mesh, Material=Material, Depsgraph=Depsgraph,
+    VIEW3D_MT_object_animation=types.SimpleNamespace(
+        append=lambda f: None, remove=lambda f: None))
+bpy.app = types.SimpleNamespace(
+    version=(2, 93, 0), binary_path="blender", background=True,
+    handlers=types.SimpleNamespace(depsgraph_update_post=[], load_post=[], undo_post=[], redo_post=[],
+                                   load_pre=[], undo_pre=[], redo_pre=[],
+                                   persistent=lambda f: f))
+bpy.data = types.SimpleNamespace(is_saved=True, is_dirty=False, filepath="", objects=_Collection(),
+                                 scenes=_Scenes(), collections=_Collection())
+bpy.path = types.SimpleNamespace(abspath=_abspath)
+_registered = {}
+
+
+def _register_class(cls):
+    _registered[cls.bl_idname] = cls
+
+
+def _unregister_class(cls):
+    _registered.pop(cls.bl_idname, None)
+
+
+class _OpsModule:
+
+    def __init__(self, module):
+        self.module = module
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            op = _registered[self.module + "." + name]()
+            for key, value in kwargs.items():
+                setattr(op, key, value)
+            return op.execute(bpy.context)
+        return call
+
+
+bpy.utils = types.SimpleNamespace(register_class=_register_class,
+                                  unregister_class=_unregister_class)
+bpy.ops = types.SimpleNamespace(object=_OpsModule("object"), wm=_OpsModule("wm"))
+bpy.context = None
+
+mathutils = types.ModuleType("mathutils")
+mathutils.Vector = Vector
+mathutils.Matrix = Matrix
+mathutils.Euler = Euler
+mathutils.Quaternion = Quaternion
+
+
+def install():
+    sys.modules["bpy"] = bpy
+    sys.modules["mathutils"] = mathutils
+    return bpy
+
+
+def new_context(directory):
+    # fresh scene with the blend file "saved" in directory
+    scene = Scene()
+    bpy.data.filepath = os.path.join(directory, "bench.blend")
+    bpy.data.is_saved = True
+    bpy.data.scenes[:] = [scene]
+    bpy.data.objects[:] = []
+    bpy.context = Context(scene)
+    for handler in bpy.app.handlers.load_post:
+        handler(None)
+    return bpy.context
+
+
+def animated_empty(name, n_keys, n_frames, seed=0):
+    # empty with location/rotation/scale fcurves keyed n_keys times
+    obj = Object(name)
+    step = max(1, n_frames // max(1, n_keys))
+    frames = list(range(1, n_frames + 1, step))[:max(1, n_keys)]
+    fcurves = []
+    for i in range(3):
+        fcurves.append(FCurve("location", i, [(f, seed + i + f * 0.1) for f in frames]))
+        fcurves.append(FCurve("rotation_euler", i, [(f, (seed + i) * 0.1 + f * 0.01) for f in frames]))
+        fcurves.append(FCurve("scale", i, [(f, 1.0 + 0.001 * f) for f in frames]))
+    obj.animation_data = AnimData(Action(name + "Action", fcurves))
+    bpy.data.objects.append(obj)
+    return obj
+
+
+def grid_mesh_object(name, n_vertices, seed=0):
+    # mesh object on a square-ish grid with one quad-like loop set and uv layer
+    side = max(1, int(math.sqrt(n_vertices)))
+    coords = [((i % side) * 0.1 + seed, (i // side) * 0.1, 0.0) for i in range(n_vertices)]
+    loops = list(range(n_vertices))
+    uvs = [((i % side) / side, (i // side) / side) for i in range(n_vertices)]
+    mesh = Mesh(name + "Mesh", coords, loops, [UVLayer("UVMap", uvs)])
+    obj = Object(name, "MESH", mesh)
+    obj.modifiers.append(Modifier("Wave", "WAVE"))
+    obj.location = Vector((seed, 0.0, 0.0))
+    bpy.data.objects.append(obj)
+    return obj
+
+
+def animated_material(name, n_keys, n_frames, seed=0):
+    # material with diffuse_color and emit fcurves keyed n_keys times
+    material = Material(name)
+    step = max(1, n_frames // max(1, n_keys))
+    frames = list(range(1, n_frames + 1, step))[:max(1, n_keys)]
+    fcurves = [FCurve("diffuse_color", i, [(f, (seed + i + f) % 10 * 0.1) for f in frames])
+               for i in range(3)]
+    fcurves.append(FCurve("emit", 0, [(f, f * 0.01) for f in frames]))
+    material.animation_data = AnimData(Action(name + "Action", fcurves))
+    return material
@@ -0,0 +1,339 @@
+"""
+on-disk cache of sampled rows, to re-export a scene after small edits.
+
+every object gets a content hash of everything its rows depend on: the
+keyframes of its action and of its parents' actions, its static transforms,
+its modifiers and mesh (for mesh exports) and the exported frames. rows of an
+unchanged hash are read back from `.<blend name>.save_keyframes_cache/` next
+to the .blend file, only the other objects are sampled. objects depending on
+other data in ways which are not hashed (constraints, drivers, nla, modifiers
+referring to another data block such as an object, collection, texture or
+node group, particles, parents other than a whole object, such as a bone,
+vertices or a deforming armature or lattice, and curve parents whose curve is
+animated) are always sampled.
+
+entries are .npy files, memory-mapped when read. the least recently used ones
+are removed when the directory grows over the size limit.
+"""
+
+import hashlib
+import os
+
+import bpy
+import numpy as np
+
+from . import profiling
+from . import sampling
+
+# bump when the rows written for the same scene change
+CACHE_VERSION = 2
+BASIS_PATHS = (
+    "location", "rotation_euler", "rotation_quaternion", "rotation_axis_angle", "scale",
+    "delta_location", "delta_rotation_euler", "delta_rotation_quaternion", "delta_scale")
+# creases and bevel weights, edge properties before blender 4.0 and
+# attributes since
+EDGE_WEIGHTS = ("crease", "bevel_weight")
+WEIGHT_ATTRIBUTES = ("crease_vert", "crease_edge", "bevel_weight_vert", "bevel_weight_edge")
+
+
+def export_cache(scene):
+    # the cache of the saved .blend file, None when disabled
+    if not scene.save_keyframes_use_cache or not bpy.data.is_saved:
+        return None
+    name = "." + os.path.splitext(os.path.basename(bpy.data.filepath))[0] + ".save_keyframes_cache"
+    return Cache(bpy.path.abspath("//" + name), scene.save_keyframes_cache_size * (1 << 20))
+
+
+def _rna_digest(h, struct):
+    # every plain property of struct, ids by name
+    for prop in struct.bl_rna.properties:
+        if prop.identifier == "rna_type" or prop.type == "COLLECTION":
+            continue
+        value = getattr(struct, prop.identifier, None)
+        if prop.type == "POINTER":
+            value = getattr(value, "name", None)
+        elif getattr(prop, "is_array", False):
+            value = tuple(value)
+        h.update(repr((prop.identifier, value)).encode("utf-8"))
+
+
+def _action_digest(h, action):
+    for fc in action.fcurves:
+        h.update(repr((fc.data_path, fc.array_index, fc.mute, fc.extrapolation)).encode("utf-8"))
+        points = fc.keyframe_points
+        for attr in ("co", "handle_left", "handle_right"):
+            buf = np.empty(len(points) * 2, dtype=np.float32)
+            points.foreach_get(attr, buf)
+            h.update(buf.tobytes())
+        h.update(repr([(p.interpolation, p.easing) for p in points]).encode("utf-8"))
+        for modifier in fc.modifiers:
+            _rna_digest(h, modifier)
+
+
+def _foreach_digest(h, items, attr, width=1, dtype=np.float32):
+    buf = np.empty(len(items) * width, dtype=dtype)
+    items.foreach_get(attr, buf)
+    h.update(buf.tobytes())
+
+
+def _animated_channels(obj):
+    ad = obj.animation_data
+    if ad is None or ad.action is None:
+        return set()
+    return {(fc.data_path, fc.array_index) for fc in ad.action.fcurves}
+
+
+def _transform_digest(h, obj):
+    # returns False if the transform of obj depends on data which is not hashed
+    ad = obj.animation_data
+    if len(obj.constraints) > 0 or getattr(obj, "rigid_body", None) is not None:
+        return False
+    if ad is not None:
+        if len(ad.drivers) > 0 or len(ad.nla_tracks) > 0:
+            return False
+        h.update(repr((getattr(ad, "action_influence", 1.0),
+                       getattr(ad, "action_blend_type", "REPLACE"))).encode("utf-8"))
+        if ad.action is not None:
+            _action_digest(h, ad.action)
+    # values of channels without f-curve are constant, animated ones are not
+    # read at the current frame
+    animated = _animated_channels(obj)
+    static = [(path, i, v) for path in BASIS_PATHS
+              for i, v in enumerate(getattr(obj, path))
+              if (path, i) not in animated]
+    h.update(repr((obj.rotation_mode, obj.parent_type, getattr(obj, "parent_bone", ""),
+                   static, [tuple(r) for r in obj.matrix_parent_inverse])).encode("utf-8"))
+    if obj.parent is not None:
+        # bone, vertex, armature and lattice parents depend on bones, pose
+        # constraints or the deformed mesh, an animated curve on its path
+        if obj.parent_type != "OBJECT":
+            return False
+        if obj.parent.type == "CURVE" and sampling.is_animated_data(obj.parent.data):
+            return False
+        h.update(b"parent")
+        return _transform_digest(h, obj.parent)
+    return True
+
+
+def _mesh_digest(h, obj):
+    # returns False if the evaluated mesh of obj depends on data which is not hashed
+    if len(getattr(obj, "particle_systems", ())) > 0:
+        return False
+    for modifier in obj.modifiers:
+        # objects, collections, textures, node groups, ... are hashed by name
+        # only, their contents can change
+        for prop in modifier.bl_rna.properties:
+            if prop.type == "POINTER" and isinstance(getattr(modifier, prop.identifier), bpy.types.ID):
+                return False
+        _rna_digest(h, modifier)
+    mesh = obj.data
+    _foreach_digest(h, mesh.vertices, "co", 3)
+    _foreach_digest(h, mesh.edges, "vertices", 2, np.int32)
+    _foreach_digest(h, mesh.loops, "vertex_index", 1, np.int32)
+    _foreach_digest(h, mesh.polygons, "loop_total", 1, np.int32)
+    for name in EDGE_WEIGHTS:
+        if len(mesh.edges) > 0 and hasattr(mesh.edges[0], name):
+            _foreach_digest(h, mesh.edges, name)
+    attributes = getattr(mesh, "attributes", None)
+    if attributes is not None:
+        for name in WEIGHT_ATTRIBUTES:
+            attribute = attributes.get(name)
+            if attribute is not None:
+                h.update(name.encode("utf-8"))
+                _foreach_digest(h, attribute.data, "value")
+    # vertex groups are referred to by name from modifiers
+    if len(obj.vertex_groups) > 0:
+        h.update(repr([group.name for group in obj.vertex_groups]).encode("utf-8"))
+        h.update(repr([[(g.group, g.weight) for g in v.groups] for v in mesh.vertices]).encode("utf-8"))
+    keys = mesh.shape_keys
+    if keys is not None:
+        if keys.animation_data is not None:
+            if len(keys.animation_data.drivers) > 0:
+                return False
+            if keys.animation_data.action is not None:
+                _action_digest(h, keys.animation_data.action)
+        for block in keys.key_blocks:
+            h.update(repr((block.name, block.value, block.mute)).encode("utf-8"))
+            _foreach_digest(h, block.data, "co", 3)
+    simplify = bpy.context.scene.render
+    h.update(repr((simplify.use_simplify, simplify.simplify_subdivision)).encode("utf-8"))
+    return True
+
+
+def object_key(obj, kind, frames):
+    # content hash of the rows of obj for an exporter kind, None if not cacheable
+    h = hashlib.sha1(repr((CACHE_VERSION, kind, list(frames))).encode("utf-8"))
+    if not _transform_digest(h, obj):
+        return None
+    if kind == "mesh" and not _mesh_digest(h, obj):
+        return None
+    return h.hexdigest()
+
+
+class Cache:
+
+    def __init__(self, directory, size_limit):
+        self.directory = directory
+        self.size_limit = size_limit
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def load(self, key):
+        # cached rows of key as a read-only memmap, None on a miss
+        if key is None or not os.path.exists(self.path(key)):
+            return None
+        os.utime(self.path(key))
+        return np.load(self.path(key), mmap_mode="r")
+
+    def create(self, key, shape, dtype=np.float64):
+        # memmap to fill while sampling, stored under key by commit()
+        return np.lib.format.open_memmap(self.path(key) + ".tmp", mode="w+", dtype=dtype, shape=shape)
+
+    def commit(self, key, rows):
+        # rows has to be the last reference to the memmap, so that it is
+        # closed before the file is renamed
+        rows.flush()
+        del rows
+        os.replace(self.path(key) + ".tmp", self.path(key))
+
+    def discard(self, key, rows):
+        del rows
+        if os.path.exists(self.path(key) + ".tmp"):
+            os.remove(self.path(key) + ".tmp")
+
+    def evict(self):
+        # removes least recently used entries over the size limit
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".npy"):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.size_limit:
+                break
+            os.remove(path)
+            total -= size
+
+
+def sample_transforms(scene, objs, frames, cache, depsgraph=None, rotation="EULER"):
+    # sampling.sample_transforms() reading unchanged objects from cache
+    if cache is None:
+        yield from sampling.sample_transforms(scene, objs, frames, depsgraph, rotation)
+        return
+    width = sampling.TRANSFORM_WIDTHS[rotation]
+    with profiling.phase("cache"):
+        keys = [object_key(obj, "transform_" + rotation, frames) for obj in objs]
+        cached = [cache.load(key) for key in keys]
+    misses = [i for i, rows in enumerate(cached) if rows is None]
+    hits = [i for i, rows in enumerate(cached) if rows is not None]
+    stores = {i: cache.create(keys[i], (len(frames), width)) for i in misses if keys[i] is not None}
+    try:
+        sampled = sampling.sample_transforms(scene, [objs[i] for i in misses], frames, depsgraph, rotation)
+        for j, (frame, sampled_rows) in enumerate(sampled):
+            rows = np.empty((len(objs), width))
+            rows[misses] = sampled_rows
+            for i, row in zip(misses, sampled_rows):
+                if i in stores:
+                    stores[i][j] = row
+            for i in hits:
+                rows[i] = cached[i][j]
+            yield frame, rows
+    except BaseException:
+        for i in list(stores):
+            cache.discard(keys[i], stores.pop(i))
+        raise
+    with profiling.phase("cache"):
+        for i in list(stores):
+            cache.commit(keys[i], stores.pop(i))
+        cache.evict()
+
+
+def sample_keyframe_transforms(scene, frames_of_objs, cache, depsgraph=None, rotation="EULER"):
+    # sampling.sample_keyframe_transforms() reading unchanged objects from cache
+    if cache is None:
+        yield from sampling.sample_keyframe_transforms(scene, frames_of_objs, depsgraph, rotation)
+        return
+    frames_of_objs = [(obj, sorted(frames)) for obj, frames in frames_of_objs]
+    order = {obj.name: i for i, (obj, frames) in enumerate(frames_of_objs)}
+    hit_at = {}
+    misses = []
+    keys = {}
+    stores = {}
+    positions = {}
+    for obj, frames in frames_of_objs:
+        with profiling.phase("cache"):
+            key = object_key(obj, "transform_" + rotation, frames)
+            rows = cache.load(key)
+        if rows is None:
+            misses.append((obj, frames))
+            if key is not None:
+                keys[obj.name] = key
+                stores[obj.name] = cache.create(key, (len(frames), sampling.TRANSFORM_WIDTHS[rotation]))
+                positions[obj.name] = {frame: j for j, frame in enumerate(frames)}
+            continue
+        for frame, row in zip(frames, rows):
+            hit_at.setdefault(frame, []).append((obj, row))
+    try:
+        sampled = sampling.sample_keyframe_transforms(scene, misses, depsgraph, rotation)
+        sampled_frame, sampled_rows = next(sampled, (None, None))
+        for frame in sorted(set(hit_at) | {f for obj, frames in misses for f in frames}):
+            entries = hit_at.pop(frame, [])
+            if frame == sampled_frame:
+                for obj, row in sampled_rows:
+                    if obj.name in stores:
+                        stores[obj.name][positions[obj.name][frame]] = row
+                entries += sampled_rows
+                sampled_frame, sampled_rows = next(sampled, (None, None))
+            entries.sort(key=lambda entry: order[entry[0].name])
+            yield frame, entries
+    except BaseException:
+        for name in list(stores):
+            cache.discard(keys[name], stores.pop(name))
+        raise
+    with profiling.phase("cache"):
+        for name in list(stores):
+            cache.commit(keys[name], stores.pop(name))
+        cache.evict()
+
+
+def sample_vertices(context, objs, frames, cache, scene=None, depsgraph=None):
+    # sampling.sample_vertices() reading unchanged meshes from cache.
+    # meshes whose vertex count changes over the frames are not stored
+    if cache is None:
+        yield from sampling.sample_vertices(context, objs, frames, scene, depsgraph)
+        return
+    with profiling.phase("cache"):
+        keys = [object_key(obj, "mesh", frames) for obj in objs]
+        cached = [cache.load(key) for key in keys]
+    misses = [i for i, rows in enumerate(cached) if rows is None]
+    hits = [i for i, rows in enumerate(cached) if rows is not None]
+    stores = {}
+    try:
+        sampled = sampling.sample_vertices(context, [objs[i] for i in misses], frames, scene, depsgraph)
+        for j, (frame, sampled_vertices) in enumerate(sampled):
+            vertices = [None] * len(objs)
+            for i, co in zip(misses, sampled_vertices):
+                vertices[i] = co
+                if j == 0 and keys[i] is not None:
+                    stores[i] = cache.create(keys[i], (len(frames),) + co.shape, np.float32)
+                if i not in stores:
+                    continue
+                if stores[i].shape[1:] != co.shape:
+                    cache.discard(keys[i], stores.pop(i))
+                    continue
+                stores[i][j] = co
+            for i in hits:
+                vertices[i] = cached[i][j]
+            yield frame, vertices
+    except BaseException:
+        for i in list(stores):
+            cache.discard(keys[i], stores.pop(i))
+        raise
+    with profiling.phase("cache"):
+        for i in list(stores):
+            cache.commit(keys[i], stores.pop(i))
+        cache.evict()
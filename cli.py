@@ -0,0 +1,298 @@
+"""
+run the exporters without the ui, e.g. on a render farm.
+
+    blender -b shot.blend --python path/to/add-on/__main__.py -- \
+        --exporter animations --id-key "^UAV" --start 1 --end 250 \
+        --output //uav.csv --format CSV --select
+
+with the add-on enabled the module can be run directly:
+
+    blender -b shot.blend --python-expr "from save_object_keyframes import cli; cli.main()" -- ...
+
+--jobs takes a json list of jobs, with the long option names as keys
+(e.g. {"blend": "a.blend", "exporter": "keyframes", "id_key": "^UAV"}),
+to run many exports, across several .blend files, in one blender process.
+every job prints one timing line, --report writes them all as json.
+consecutive jobs of the same .blend file reuse it while it is unchanged on
+disk, the frame, selection and active object are restored after every job.
+
+--serve <host>:<port> runs the jobs sent by a worker pool, see pool.py.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+import traceback
+
+import bpy
+
+from . import formats
+from . import profiling
+from . import sampling
+from . import selection
+
+# environment variable with the token a worker sends to its pool
+TOKEN_VARIABLE = "SAVE_KEYFRAMES_POOL_TOKEN"
+# modification time of the .blend files loaded by run_job()
+_loaded_mtimes = {}
+
+# exporter name: (operator idname in bpy.ops.object, True if it takes a filepath)
+EXPORTERS = {
+    "keyframes": ("save_object_keyframes", False),
+    "animations": ("save_animations", False),
+    "animations_of_mesh": ("save_animations_of_mesh", False),
+    "material_keyframes": ("save_object_material_keyframes", False),
+    "selection_positions": ("save_selection_positions", True),
+    "vertices_positions_of_mesh": ("save_vertices_positions_of_mesh", True),
+    "mesh_animation_vertices": ("save_mesh_animation_vertices", True),
+    "uv_map_of_mesh": ("save_uv_map_of_mesh", True),
+}
+
+
+def parser():
+    p = argparse.ArgumentParser(
+        prog="save_object_keyframes",
+        description="Run save object keyframes exporters without the ui.")
+    p.add_argument("--blend", help=".blend file to open before the export (default: the loaded file)")
+    p.add_argument("--exporter", choices=sorted(EXPORTERS), default="animations")
+    p.add_argument("--id-key", default="", help="regular expression of the object names")
+    p.add_argument("--start", type=int, help="start frame (default: scene start)")
+    p.add_argument("--end", type=int, help="end frame (default: scene end)")
+    p.add_argument("--interval", type=int, default=1)
+    p.add_argument("--adaptive", action="store_true",
+                   help="save only the frames needed to interpolate the motion within the tolerances (animations)")
+    p.add_argument("--position-tolerance", type=float, default=0.01)
+    p.add_argument("--rotation-tolerance", type=float, default=0.0174533, help="radians")
+    p.add_argument("--rotation", choices=[r[0] for r in sampling.ROTATIONS], default="EULER",
+                   help="rotation columns of the transform rows")
+    p.add_argument("--collection", default="",
+                   help="only objects of this collection or of its children")
+    p.add_argument("--types", nargs="*", default=[], choices=[t[0] for t in selection.object_types()],
+                   help="only objects of these types")
+    p.add_argument("--animated-only", action="store_true",
+                   help="only objects which move, or meshes which deform, over the frames")
+    p.add_argument("--isolate", action="store_true",
+                   help="set the frames of a temporary scene with only the exported objects and their dependencies")
+    p.add_argument("--output", help="output file, // is the .blend directory (default: //keyframes.csv)")
+    p.add_argument("--format", choices=[f[0] for f in formats.FILE_FORMATS], default="CSV")
+    p.add_argument("--gzip", action="store_true", help="compress csv output with gzip (.csv.gz)")
+    p.add_argument("--decimals", type=int,
+                   help="write csv values with this many decimals (default: every digit)")
+    p.add_argument("--precision", type=float, default=formats.DELTA_PRECISION,
+                   help="quantization step of the DELTA format")
+    p.add_argument("--codec", choices=sorted(formats.CODECS), default="ZLIB",
+                   help="compression of the DELTA format")
+    p.add_argument("--select", action="store_true",
+                   help="select the objects matched by --id-key, for the exporters working on the selection")
+    p.add_argument("--active", help="name of the active object, for the exporters working on it")
+    p.add_argument("--all-uv-layers", action="store_true",
+                   help="save every uv layer of the mesh (uv_map_of_mesh)")
+    p.add_argument("--workers", type=int, default=1,
+                   help="background blender processes exporting shards of the frames (mesh animations)")
+    p.add_argument("--retries", type=int, default=1, help="times a failed worker is started again")
+    p.add_argument("--profile", action="store_true",
+                   help="time the phases of the export, the profile is added to the --report record")
+    p.add_argument("--profile-json", action="store_true",
+                   help="with --profile, also write <output>.profile.json")
+    p.add_argument("--jobs", help="json file with a list of jobs, overrides the other options")
+    p.add_argument("--report", help="write the timing of every job to this json file")
+    p.add_argument("--serve", metavar="HOST:PORT",
+                   help="run the jobs of the worker pool listening at this address, see pool.py")
+    return p
+
+
+def job_of(args):
+    job = vars(args).copy()
+    for key in ("jobs", "report", "serve"):
+        job.pop(key)
+    return job
+
+
+def job_defaults():
+    return job_of(parser().parse_args([]))
+
+
+def load_jobs(args):
+    if args.jobs is None:
+        return [job_of(args)]
+    defaults = job_defaults()
+    with open(args.jobs, encoding="utf-8") as f:
+        return [dict(defaults, **job) for job in json.load(f)]
+
+
+def open_blend(filepath):
+    # opens filepath unless it is the loaded file and did not change on disk
+    # since it was loaded. returns True if it was loaded
+    filepath = os.path.abspath(filepath)
+    mtime = os.path.getmtime(filepath)
+    if filepath == bpy.data.filepath and _loaded_mtimes.get(filepath, mtime) == mtime:
+        return False
+    bpy.ops.wm.open_mainfile(filepath=filepath, load_ui=False)
+    _loaded_mtimes.clear()
+    _loaded_mtimes[filepath] = mtime
+    return True
+
+
+def saved_state():
+    # frame, selection and active object changed by a job
+    scene = bpy.context.scene
+    if bpy.app.version < (2, 80, 0):
+        selected = {obj.name for obj in scene.objects if obj.select}
+        active = scene.objects.active
+    else:
+        selected = {obj.name for obj in scene.objects if obj.select_get()}
+        active = bpy.context.view_layer.objects.active
+    return scene, scene.frame_current, selected, None if active is None else active.name
+
+
+def restore_state(state):
+    scene, frame, selected, active = state
+    if bpy.context.scene != scene:
+        return
+    if scene.frame_current != frame:
+        scene.frame_set(frame)
+    for obj in scene.objects:
+        if bpy.app.version < (2, 80, 0):
+            obj.select = obj.name in selected
+        else:
+            obj.select_set(obj.name in selected)
+    if active is not None and bpy.data.objects.get(active) is not None:
+        set_active(active)
+
+
+def select_matched(id_key):
+    search = selection.pattern(id_key).search
+    for obj in bpy.context.scene.objects:
+        matched = search(obj.name) is not None
+        if bpy.app.version < (2, 80, 0):
+            obj.select = matched
+        else:
+            obj.select_set(matched)
+
+
+def set_active(name):
+    obj = bpy.data.objects[name]
+    if bpy.app.version < (2, 80, 0):
+        bpy.context.scene.objects.active = obj
+    else:
+        bpy.context.view_layer.objects.active = obj
+
+
+def run_job(job):
+    # runs one export, returns its timing record. a failing job does not
+    # stop the following ones
+    output = job["output"] or "//keyframes.csv"
+    record = {"blend": job["blend"] or bpy.data.filepath, "exporter": job["exporter"]}
+    start = time.perf_counter()
+    profiling.last = None
+    state = None
+    try:
+        record["loaded"] = bool(job["blend"]) and open_blend(job["blend"])
+        record["load_seconds"] = time.perf_counter() - start
+        if not hasattr(bpy.types.Scene, "save_keyframes_id_key"):
+            from . import register
+            register()
+        state = saved_state()
+        output = formats.output_path(bpy.path.abspath(output), job["format"], job["gzip"])
+        configure(bpy.context.scene, job, output)
+        idname, takes_filepath = EXPORTERS[job["exporter"]]
+        kwargs = {"filepath": output} if takes_filepath else {}
+        if job["exporter"] == "mesh_animation_vertices":
+            # exports from the current frame to end_frame
+            if job["start"] is not None:
+                bpy.context.scene.frame_set(job["start"])
+            if job["end"] is not None:
+                kwargs["end_frame"] = job["end"]
+        if job["exporter"] == "uv_map_of_mesh":
+            kwargs["all_uv_layers"] = job["all_uv_layers"]
+        getattr(bpy.ops.object, idname)("EXEC_DEFAULT", **kwargs)
+        record["status"] = "FINISHED"
+    except Exception:
+        record["status"] = "FAILED"
+        record["error"] = traceback.format_exc()
+    if state is not None:
+        try:
+            restore_state(state)
+        except Exception:
+            # the next job loads the file again
+            _loaded_mtimes[bpy.data.filepath] = None
+    record["seconds"] = time.perf_counter() - start
+    record["output"] = output
+    record["bytes"] = os.path.getsize(output) if os.path.exists(output) else 0
+    if profiling.last is not None:
+        record["profile"] = profiling.last.as_dict()
+    return record
+
+
+def configure(scene, job, output):
+    # job options to the scene properties read by the operators
+    scene.save_keyframes_id_key = job["id_key"]
+    scene.save_keyframes_collection = job["collection"]
+    scene.save_keyframes_object_types = set(job["types"])
+    scene.save_keyframes_animated_only = job["animated_only"]
+    scene.save_keyframes_start_frame = scene.frame_start if job["start"] is None else job["start"]
+    scene.save_keyframes_end_frame = scene.frame_end if job["end"] is None else job["end"]
+    scene.save_keyframes_interval = job["interval"]
+    scene.save_keyframes_adaptive = job["adaptive"]
+    scene.save_keyframes_position_tolerance = job["position_tolerance"]
+    scene.save_keyframes_rotation_tolerance = job["rotation_tolerance"]
+    scene.save_keyframes_rotation = job["rotation"]
+    scene.save_keyframes_isolate = job["isolate"]
+    scene.save_keyframes_file_name = os.path.splitext(formats.output_path(output, job["format"]))[0]
+    scene.save_keyframes_file_format = job["format"]
+    scene.save_keyframes_gzip = job["gzip"]
+    scene.save_keyframes_fixed = job["decimals"] is not None
+    if job["decimals"] is not None:
+        scene.save_keyframes_decimals = job["decimals"]
+    scene.save_keyframes_precision = job["precision"]
+    scene.save_keyframes_codec = job["codec"]
+    scene.save_keyframes_workers = job["workers"]
+    scene.save_keyframes_worker_retries = job["retries"]
+    scene.save_keyframes_profile = job["profile"]
+    scene.save_keyframes_profile_json = job["profile_json"]
+    if job["select"]:
+        select_matched(job["id_key"])
+    if job["active"]:
+        set_active(job["active"])
+
+
+def serve(address):
+    # worker of pool.py: connects to the pool at address, then runs every job
+    # received, one json object per line, and answers with its record
+    host, port = address.rsplit(":", 1)
+    connection = socket.create_connection((host, int(port)))
+    defaults = job_defaults()
+    with connection, connection.makefile("r", encoding="utf-8") as reader, \
+            connection.makefile("w", encoding="utf-8") as writer:
+        writer.write(json.dumps({"token": os.environ.get(TOKEN_VARIABLE, ""), "pid": os.getpid()}) + "\n")
+        writer.flush()
+        for line in reader:
+            record = run_job(dict(defaults, **json.loads(line)))
+            writer.write(json.dumps(record) + "\n")
+            writer.flush()
+    return 0
+
+
+def main(argv=None):
+    # argv defaults to the arguments after "--" of the blender command line
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    args = parser().parse_args(argv)
+    if args.serve:
+        return serve(args.serve)
+    records = []
+    for job in load_jobs(args):
+        record = run_job(job)
+        records.append(record)
+        print("save_object_keyframes: {} {} -> {} ({:.3f} s, {} bytes)".format(
+            record["status"], record["exporter"], record["output"],
+            record["seconds"], record["bytes"]))
+        if "error" in record:
+            print(record["error"], file=sys.stderr)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2)
+    return int(any(r["status"] != "FINISHED" for r in records))
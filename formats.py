@@ -0,0 +1,649 @@
+"""
+output writers of the exporters.
+
+    - CSV: decimal text, one row per line. floats are written with str(), or
+      rounded to a fixed number of decimals, and blocks of rows are
+      formatted from arrays in a single call.
+
+    - BINARY: columnar float32 file which can be memory-mapped:
+        magic b"SOKF", uint32 version, uint32 header size,
+        utf-8 json header {"columns", "names", "rows", "blocks"},
+        padding to 64 bytes, then the blocks, each aligned to 64 bytes:
+            frame  (rows,)          int32    frame of each row
+            object (rows,)          int32    index into the names table
+            values (rows, columns)  float32  transform / vertex / uv block
+      files of rows without object and frame (vertices positions, uv map)
+      only have the values block.
+
+    - DELTA: values quantized to a precision, every row stored as the
+      difference to the previous row of the same object id. rows which did
+      not change are skipped. records are compressed in blocks:
+        magic b"SOKD", uint32 version, uint32 header size,
+        utf-8 json header {"columns", "keyed", "precision", "codec"},
+        then blocks of uint32 compressed size + compressed records:
+            int32 frame, uint32 rows, uint32 names size, uint8 explicit
+            slots, uint8 delta dtype, then uint32 first slot (contiguous
+            slots) or int32 slot of every row, json list of the object ids
+            seen for the first time, changed rows bitmask, deltas of the
+            changed rows (rows, columns) in the smallest int dtype.
+      a slot is the index of an object id in the order of first appearance.
+
+this module does not depend on bpy, read_columnar() and read_delta() can be
+used outside of blender by copying the file.
+
+every writer writes through a BackgroundFile: blocks of formatted rows are
+queued to a thread which writes them, so sampling the next frames overlaps
+with the disk. the rows go to a temporary file next to the output, which is
+synced and renamed to the output when the writer is closed, so readers never
+see a partial file. csv files can be compressed with gzip on the way.
+"""
+
+import gzip
+import json
+import lzma
+import os
+import queue
+import struct
+import tempfile
+import threading
+import zlib
+from itertools import repeat
+
+import numpy as np
+
+FILE_FORMATS = (
+    ("CSV", "CSV", "Decimal text, one row per line"),
+    ("BINARY", "Binary", "Columnar float32 blocks, memory-mappable"),
+    ("DELTA", "Delta", "Quantized differences between frames, compressed"),
+)
+EXTENSIONS = {"CSV": ".csv", "BINARY": ".bin", "DELTA": ".delta"}
+CODECS = {
+    "ZLIB": (zlib.compress, zlib.decompress),
+    "LZMA": (lzma.compress, lzma.decompress),
+}
+CODEC_ITEMS = (
+    ("ZLIB", "zlib", "Fast compression"),
+    ("LZMA", "lzma", "Smaller files, slower"),
+)
+
+TRANSFORM_COLUMNS = (
+    "location_0", "location_1", "location_2",
+    "rotation_euler_0", "rotation_euler_1", "rotation_euler_2",
+    "scale_0", "scale_1", "scale_2")
+QUATERNION_TRANSFORM_COLUMNS = (
+    "location_0", "location_1", "location_2",
+    "rotation_quaternion_0", "rotation_quaternion_1", "rotation_quaternion_2", "rotation_quaternion_3",
+    "scale_0", "scale_1", "scale_2")
+MATRIX_TRANSFORM_COLUMNS = tuple(
+    "matrix_world_{}_{}".format(i, j) for i in range(3) for j in range(4))
+MATERIAL_COLUMNS = (
+    "diffuse_color_r", "diffuse_color_g", "diffuse_color_b",
+    "specular_color_r", "specular_color_g", "specular_color_b",
+    "emit", "ambient", "translucency")
+VERTEX_COLUMNS = ("x", "y", "z")
+UV_COLUMNS = ("u", "v")
+# constant rotation and scale of the vertex rows in csv
+VERTEX_SUFFIX = ",0,0,0,1.0,1.0,1.0"
+
+MAGIC = b"SOKF"
+DELTA_MAGIC = b"SOKD"
+VERSION = 1
+# default quantization step of the delta format
+DELTA_PRECISION = 1e-4
+DELTA_DTYPES = ("<i1", "<i2", "<i4", "<i8")
+RECORD = struct.Struct("<iIIBB")
+ALIGNMENT = 64
+# bytes of rows held in memory by a writer before they are written out
+BUFFER_SIZE = 1 << 20
+# blocks waiting for the writing thread before write() blocks
+QUEUE_BLOCKS = 16
+# queued blocks are joined into writes of up to WRITE_SIZE bytes
+WRITE_SIZE = 1 << 22
+GZIP_EXTENSION = ".gz"
+GZIP_LEVEL = 6
+
+
+def extension(file_format, compressed=False):
+    # compressed: gzip, csv only
+    if compressed and file_format == "CSV":
+        return EXTENSIONS[file_format] + GZIP_EXTENSION
+    return EXTENSIONS[file_format]
+
+
+def output_path(filepath, file_format, compressed=False):
+    # filepath with the extension of file_format
+    if filepath.endswith(GZIP_EXTENSION):
+        filepath = filepath[:-len(GZIP_EXTENSION)]
+    stem, ext = os.path.splitext(filepath)
+    if ext not in EXTENSIONS.values():
+        stem = filepath
+    return stem + extension(file_format, compressed)
+
+
+def open_writer(filepath, file_format, columns, keyed=True, suffix="",
+                precision=DELTA_PRECISION, codec="ZLIB", compressed=False, decimals=None):
+    # keyed rows start with object_id and frame.
+    # suffix is appended to every csv row after the values.
+    # precision and codec are the options of the delta format,
+    # compressed writes csv through gzip, decimals: fixed decimals of csv
+    # values, None for str()
+    if file_format == "BINARY":
+        return ColumnarWriter(filepath, columns, keyed)
+    if file_format == "DELTA":
+        return DeltaWriter(filepath, columns, keyed, precision, codec)
+    return CsvWriter(filepath, columns, keyed, suffix, compressed=compressed, decimals=decimals)
+
+
+def transform_columns(rotation):
+    # columns of the transform rows of a rotation of sampling.ROTATIONS
+    if rotation == "QUATERNION":
+        return QUATERNION_TRANSFORM_COLUMNS
+    if rotation == "MATRIX":
+        return MATRIX_TRANSFORM_COLUMNS
+    return TRANSFORM_COLUMNS
+
+
+def uv_columns(layer_names):
+    # columns of several uv layers in one file
+    return tuple(name + "_" + column for name in layer_names for column in UV_COLUMNS)
+
+
+def vertex_ids(name, count):
+    # name_000001 is the last vertex, rows are written in reversed vertex order
+    return [name + "_" + ("000000" + str(i + 1))[-6:] for i in range(count)]
+
+
+class BackgroundFile:
+    # binary file written by a thread. write() queues str (utf-8) or bytes
+    # blocks and only waits when QUEUE_BLOCKS blocks are queued. close() waits
+    # for the thread, syncs and renames the temporary file to filepath,
+    # discard() removes it. an error of the thread is raised by the next
+    # write() or by close()
+
+    def __init__(self, filepath, compressed=False, queue_blocks=QUEUE_BLOCKS):
+        self.filepath = filepath
+        directory, name = os.path.split(os.path.abspath(filepath))
+        fd, self.temporary = tempfile.mkstemp(prefix="." + name + ".", suffix=".part", dir=directory)
+        self.raw = os.fdopen(fd, "wb", buffering=0)
+        self.file = self.raw
+        if compressed:
+            # no file name nor time in the header, same rows give the same file
+            self.file = gzip.GzipFile(filename="", mode="wb", fileobj=self.raw,
+                                      compresslevel=GZIP_LEVEL, mtime=0)
+        self.queue = queue.Queue(queue_blocks)
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._drain, name="save_keyframes_writer")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _drain(self):
+        done = False
+        while not done:
+            blocks = [self.queue.get()]
+            size = len(blocks[0]) if blocks[0] is not None else 0
+            # join what is already queued into one large write
+            while blocks[-1] is not None and size < WRITE_SIZE:
+                try:
+                    blocks.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+                if blocks[-1] is not None:
+                    size += len(blocks[-1])
+            done = blocks[-1] is None
+            if done:
+                blocks.pop()
+            if self.error is not None or not blocks:
+                continue
+            try:
+                self.file.write(b"".join(
+                    block.encode("utf-8") if isinstance(block, str) else block for block in blocks))
+            except BaseException as e:
+                # blocks queued after the error are dropped
+                self.error = e
+
+    def write(self, block):
+        if self.error is not None:
+            raise self.error
+        if block:
+            self.queue.put(block)
+
+    def _stop(self):
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+
+    def close(self):
+        if self.closed:
+            return
+        self._stop()
+        try:
+            if self.error is not None:
+                raise self.error
+            if self.file is not self.raw:
+                self.file.close()
+            os.fsync(self.raw.fileno())
+            self.raw.close()
+            # mkstemp() files are private, give the output the usual mode
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(self.temporary, 0o666 & ~umask)
+            os.replace(self.temporary, self.filepath)
+        except BaseException:
+            self.discard()
+            raise
+
+    def discard(self):
+        # drops the rows, an existing file at filepath is left as it was
+        if not self.closed:
+            self._stop()
+        self.raw.close()
+        if os.path.exists(self.temporary):
+            os.remove(self.temporary)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        _close_or_discard(self, exc[0])
+
+
+def _close_or_discard(writer, exc_type):
+    # exits of writers: an error discards the file, a closed generator
+    # (cancelled export) keeps the rows written so far
+    if exc_type is None or exc_type is GeneratorExit:
+        writer.close()
+    else:
+        writer.discard()
+
+
+class CsvWriter:
+
+    def __init__(self, filepath, columns, keyed=True, suffix="", buffer_size=BUFFER_SIZE,
+                 compressed=False, decimals=None):
+        self.filepath = filepath
+        self.keyed = keyed
+        self.decimals = decimals
+        value = "{}" if decimals is None else "{:.%df}" % decimals
+        self.values_format = ",".join([value] * len(columns)) + suffix
+        row = self.values_format + "\n"
+        self.row_format = "{},{}," + row if keyed else row
+        # formatted values of the rows last written under each key
+        self.formatted = {}
+        self.key_format = "{},{},{}\n" if keyed else "{}\n"
+        # formatted blocks are held until buffer_size characters, then written
+        self.buffer = []
+        self.buffered = 0
+        self.buffer_size = buffer_size
+        self.file = BackgroundFile(filepath, compressed)
+
+    def write(self, ids, frames, values, key=None):
+        # ids: object id of each row, frames: one frame or a frame per row,
+        # values: 2d array of rows of floats.
+        # key: rows written again under the same key reuse the formatted
+        # values of the rows which did not change, see _formatted_values()
+        if len(values) == 0:
+            return
+        if key is not None:
+            texts = self._formatted_values(key, values)
+            if self.keyed:
+                if isinstance(frames, (int, np.integer)):
+                    frames = repeat(frames)
+                block = "".join(map(self.key_format.format, ids, frames, texts))
+            else:
+                block = "".join(map(self.key_format.format, texts))
+        else:
+            columns = self._columns(values)
+            if self.keyed:
+                if isinstance(frames, (int, np.integer)):
+                    frames = repeat(frames)
+                columns = [ids, frames] + columns
+            block = "".join(map(self.row_format.format, *columns))
+        self.buffer.append(block)
+        self.buffered += len(block)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def _columns(self, values):
+        # columns of values as lists. with fixed decimals the values are
+        # rounded first, so that nothing is written as -0.000
+        if self.decimals is None:
+            return values.T.tolist()
+        return (np.round(np.asarray(values, dtype=np.float64), self.decimals) + 0.0).T.tolist()
+
+    def _formatted_values(self, key, values):
+        # rows are reused when their bits equal the row at the same position
+        # the last time
+        previous = self.formatted.get(key)
+        values = np.ascontiguousarray(values)
+        bits = values.view("u{}".format(values.itemsize))
+        if previous is None or previous[0].shape != bits.shape:
+            texts = list(map(self.values_format.format, *self._columns(values)))
+        else:
+            changed = np.flatnonzero((previous[0] != bits).any(axis=1))
+            if len(changed) == 0:
+                return previous[1]
+            texts = list(previous[1])
+            for i, text in zip(changed.tolist(),
+                               map(self.values_format.format, *self._columns(values[changed]))):
+                texts[i] = text
+        self.formatted[key] = (bits.copy(), texts)
+        return texts
+
+    def flush(self):
+        self.file.write("".join(self.buffer))
+        self.buffer = []
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def discard(self):
+        self.file.discard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        _close_or_discard(self, exc[0])
+
+
+class ColumnarWriter:
+
+    def __init__(self, filepath, columns, keyed=True, buffer_size=BUFFER_SIZE):
+        self.filepath = filepath
+        self.columns = list(columns)
+        self.keyed = keyed
+        self.names = {}
+        self.rows = 0
+        self.blocks = [("values", np.dtype(np.float32), len(self.columns))]
+        if keyed:
+            self.blocks = [("frame", np.dtype(np.int32), 0),
+                           ("object", np.dtype(np.int32), 0)] + self.blocks
+        # blocks are spooled to temporary files next to the output, so only
+        # buffer_size bytes of rows are held in memory however long the export
+        directory = os.path.dirname(os.path.abspath(filepath))
+        self.spools = {name: tempfile.TemporaryFile(dir=directory) for name, _, _ in self.blocks}
+        self.pending = {name: [] for name, _, _ in self.blocks}
+        self.pending_bytes = 0
+        self.buffer_size = buffer_size
+
+    def write(self, ids, frames, values, key=None):
+        # key: see CsvWriter.write(), rows are not formatted here
+        n = len(values)
+        if n == 0:
+            return
+        pending = self.pending
+        pending["values"].append(np.asarray(values, dtype=np.float32).reshape(n, len(self.columns)))
+        if self.keyed:
+            names = self.names
+            pending["object"].append(np.fromiter(
+                (names.setdefault(i, len(names)) for i in ids), dtype=np.int32, count=n))
+            if isinstance(frames, (int, np.integer)):
+                pending["frame"].append(np.full(n, frames, dtype=np.int32))
+            else:
+                pending["frame"].append(np.asarray(frames, dtype=np.int32))
+        self.rows += n
+        self.pending_bytes += n * (len(self.columns) + 2) * 4
+        if self.pending_bytes >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        for name, arrays in self.pending.items():
+            for array in arrays:
+                self.spools[name].write(np.ascontiguousarray(array).tobytes())
+            arrays.clear()
+        self.pending_bytes = 0
+
+    def close(self):
+        self.flush()
+        blocks = []
+        for name, dtype, width in self.blocks:
+            shape = (self.rows, width) if width else (self.rows,)
+            spool = self.spools[name]
+            spool.seek(0)
+            blocks.append((name, dtype, shape, iter(lambda spool=spool: spool.read(BUFFER_SIZE), b"")))
+        try:
+            write_columnar(self.filepath, self.columns, list(self.names), blocks)
+        finally:
+            for spool in self.spools.values():
+                spool.close()
+
+    def discard(self):
+        # the output is only written by close()
+        for spool in self.spools.values():
+            spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        _close_or_discard(self, exc[0])
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_columnar(filepath, columns, names, blocks):
+    # blocks: [(name, dtype, shape, chunks), ...] written in order after the
+    # header, chunks is an iterable of the bytes of the block
+    offset = 0
+    layout = {}
+    for name, dtype, shape, chunks in blocks:
+        layout[name] = {"offset": offset, "dtype": np.dtype(dtype).str, "shape": list(shape)}
+        offset = _aligned(offset + int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    rows = blocks[0][2][0]
+    header = json.dumps({"columns": columns, "names": names,
+                         "rows": rows, "blocks": layout}).encode("utf-8")
+    data_start = _aligned(12 + len(header))
+    with BackgroundFile(filepath) as f:
+        f.write(struct.pack("<4sII", MAGIC, VERSION, len(header)))
+        f.write(header)
+        # the file is written sequentially, alignment is zero padding
+        position = 12 + len(header)
+        for name, dtype, shape, chunks in blocks:
+            start = data_start + layout[name]["offset"]
+            f.write(bytes(start - position))
+            position = start
+            for chunk in chunks:
+                f.write(chunk)
+                position += len(chunk)
+        f.write(bytes(data_start + offset - position))
+
+
+def read_columnar(filepath):
+    # returns the header dict, with every block as a read-only np.memmap
+    with open(filepath, "rb") as f:
+        magic, version, size = struct.unpack("<4sII", f.read(12))
+        if magic != MAGIC:
+            raise Exception("Not a columnar keyframes file: {}.".format(filepath))
+        header = json.loads(f.read(size).decode("utf-8"))
+    data_start = _aligned(12 + size)
+    for name, block in header["blocks"].items():
+        shape = tuple(block["shape"])
+        if 0 in shape:
+            header[name] = np.empty(shape, dtype=block["dtype"])
+        else:
+            header[name] = np.memmap(filepath, dtype=block["dtype"], mode="r",
+                                     offset=data_start + block["offset"], shape=shape)
+    return header
+
+
+class DeltaWriter:
+
+    def __init__(self, filepath, columns, keyed=True, precision=DELTA_PRECISION, codec="ZLIB",
+                 buffer_size=BUFFER_SIZE):
+        self.filepath = filepath
+        self.columns = list(columns)
+        self.keyed = keyed
+        self.precision = precision
+        self.compress = CODECS[codec][0]
+        self.names = {}
+        self.slots = 0
+        # quantized values of every slot as last written
+        self.last = np.zeros((1024, len(self.columns)), dtype=np.int64)
+        # records are compressed by blocks of buffer_size bytes
+        self.buffer = []
+        self.buffered = 0
+        self.buffer_size = buffer_size
+        self.file = BackgroundFile(filepath)
+        header = json.dumps({"columns": self.columns, "keyed": keyed,
+                             "precision": precision, "codec": codec}).encode("utf-8")
+        self.file.write(struct.pack("<4sII", DELTA_MAGIC, VERSION, len(header)))
+        self.file.write(header)
+
+    def write(self, ids, frames, values, key=None):
+        # same arguments as CsvWriter.write(), ids are unique within a frame.
+        # unchanged rows are already skipped, key is not used
+        n = len(values)
+        if n == 0:
+            return
+        values = np.asarray(values, dtype=np.float64).reshape(n, len(self.columns))
+        if not self.keyed:
+            self._write_record(None, 0, values)
+        elif isinstance(frames, (int, np.integer)):
+            self._write_record(ids, int(frames), values)
+        else:
+            # a record per run of rows of the same frame
+            frames = np.asarray(frames)
+            starts = np.flatnonzero(np.diff(frames)) + 1
+            for start, end in zip([0] + starts.tolist(), starts.tolist() + [n]):
+                self._write_record(ids[start:end], int(frames[start]), values[start:end])
+
+    def _write_record(self, ids, frame, values):
+        n = len(values)
+        quantized = np.round(values / self.precision)
+        if not np.isfinite(quantized).all():
+            raise Exception("Delta format can not store values which are not finite.")
+        quantized = quantized.astype(np.int64)
+        known = self.slots
+        if self.keyed:
+            names = self.names
+            slots = np.fromiter((names.setdefault(i, len(names)) for i in ids), dtype=np.int64, count=n)
+            self.slots = len(names)
+            first = np.unique(slots, return_index=True)[1]
+            new_names = [ids[i] for i in first if slots[i] >= known]
+        else:
+            slots = np.arange(known, known + n)
+            self.slots += n
+            new_names = []
+        if self.slots > len(self.last):
+            last = np.zeros((max(self.slots, 2 * len(self.last)), len(self.columns)), dtype=np.int64)
+            last[:len(self.last)] = self.last
+            self.last = last
+        deltas = quantized - self.last[slots]
+        changed = (deltas != 0).any(axis=1)
+        deltas = deltas[changed]
+        self.last[slots[changed]] = quantized[changed]
+        largest = int(np.abs(deltas).max()) if deltas.size else 0
+        code = next(i for i, dtype in enumerate(DELTA_DTYPES) if largest <= np.iinfo(dtype).max)
+        contiguous = slots[-1] - slots[0] == n - 1 and (n == 1 or (np.diff(slots) == 1).all())
+        names_bytes = json.dumps(new_names).encode("utf-8") if new_names else b""
+        record = [RECORD.pack(frame, n, len(names_bytes), 0 if contiguous else 1, code),
+                  struct.pack("<I", slots[0]) if contiguous else slots.astype("<i4").tobytes(),
+                  names_bytes,
+                  np.packbits(changed).tobytes(),
+                  deltas.astype(DELTA_DTYPES[code]).tobytes()]
+        self.buffer += record
+        self.buffered += sum(map(len, record))
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            block = self.compress(b"".join(self.buffer))
+            self.file.write(struct.pack("<I", len(block)))
+            self.file.write(block)
+        self.buffer = []
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def discard(self):
+        self.file.discard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        _close_or_discard(self, exc[0])
+
+
+def _read_delta_header(f, filepath):
+    magic, version, size = struct.unpack("<4sII", f.read(12))
+    if magic != DELTA_MAGIC:
+        raise Exception("Not a delta keyframes file: {}.".format(filepath))
+    return json.loads(f.read(size).decode("utf-8"))
+
+
+def iter_delta(filepath):
+    # yields (ids, frame, values) of every record, as passed to
+    # DeltaWriter.write(): ids are None in files which are not keyed, values
+    # a float64 array. only one block is decompressed at a time
+    with open(filepath, "rb") as f:
+        header = _read_delta_header(f, filepath)
+        decompress = CODECS[header["codec"]][1]
+        width = len(header["columns"])
+        state = np.zeros((1024, width), dtype=np.int64)
+        names = []
+        size_bytes = f.read(4)
+        while size_bytes:
+            data = decompress(f.read(struct.unpack("<I", size_bytes)[0]))
+            offset = 0
+            while offset < len(data):
+                frame, n, names_size, explicit, code = RECORD.unpack_from(data, offset)
+                offset += RECORD.size
+                if explicit:
+                    slots = np.frombuffer(data, "<i4", n, offset).astype(np.int64)
+                    offset += 4 * n
+                else:
+                    start = struct.unpack_from("<I", data, offset)[0]
+                    slots = np.arange(start, start + n)
+                    offset += 4
+                if names_size:
+                    names += json.loads(data[offset:offset + names_size].decode("utf-8"))
+                    offset += names_size
+                changed = np.unpackbits(np.frombuffer(data, np.uint8, (n + 7) // 8, offset),
+                                        count=n).astype(bool)
+                offset += (n + 7) // 8
+                dtype = np.dtype(DELTA_DTYPES[code])
+                count = int(changed.sum()) * width
+                deltas = np.frombuffer(data, dtype, count, offset).reshape(-1, width)
+                offset += count * dtype.itemsize
+                if slots.max() >= len(state):
+                    grown = np.zeros((max(slots.max() + 1, 2 * len(state)), width), dtype=np.int64)
+                    grown[:len(state)] = state
+                    state = grown
+                state[slots[changed]] += deltas
+                ids = [names[i] for i in slots.tolist()] if header["keyed"] else None
+                yield ids, frame, state[slots] * header["precision"]
+            size_bytes = f.read(4)
+
+
+def read_delta(filepath):
+    # returns the header dict with the rows rebuilt like read_columnar():
+    # frame, object and names (keyed files) and values as float64 arrays,
+    # every value within precision / 2 of the written one
+    with open(filepath, "rb") as f:
+        header = _read_delta_header(f, filepath)
+    width = len(header["columns"])
+    # slots are numbered in the order the ids first appear, as written
+    slots = {}
+    frames, objects, values = [], [], []
+    for ids, frame, rows in iter_delta(filepath):
+        if header["keyed"]:
+            frames.append(np.full(len(rows), frame, dtype=np.int32))
+            objects.append(np.fromiter((slots.setdefault(i, len(slots)) for i in ids),
+                                       dtype=np.int32, count=len(ids)))
+        values.append(rows)
+    header["values"] = np.concatenate(values) if values else np.empty((0, width))
+    header["rows"] = len(header["values"])
+    if header["keyed"]:
+        header["names"] = list(slots)
+        header["frame"] = np.concatenate(frames) if frames else np.empty(0, dtype=np.int32)
+        header["object"] = np.concatenate(objects) if objects else np.empty(0, dtype=np.int32)
+    return header
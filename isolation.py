@@ -0,0 +1,128 @@
+"""
+evaluation of the exported objects apart from the rest of the scene.
+
+scene.frame_set() evaluates every object of the scene, also the set dressing,
+particles and modifiers of objects which are not exported. with
+save_keyframes_isolate set, the exporters link the matched objects and every
+object they depend on (parents, constraint and modifier targets, driver
+variables, curve bevel and taper objects) into a temporary scene, set the
+frames of that scene only and remove it when the export ends. the objects stay
+linked to their own scenes, nothing else is changed.
+
+since 2.80 the objects are read from the depsgraph of the temporary scene,
+which needs ViewLayer.depsgraph (2.81). exports of objects with rigid bodies,
+particles or simulation modifiers are not isolated: collisions, force fields
+and the rigid body world come from the whole scene.
+"""
+
+import contextlib
+
+import bpy
+
+from . import profiling
+
+SCENE_NAME = ".save_keyframes_isolated"
+# modifiers whose result depends on other objects of the scene
+SIMULATION_MODIFIERS = (
+    "CLOTH", "SOFT_BODY", "FLUID", "FLUID_SIMULATION", "SMOKE", "DYNAMIC_PAINT",
+    "PARTICLE_SYSTEM", "EXPLODE")
+
+
+def supported():
+    return bpy.app.version < (2, 80, 0) or bpy.app.version >= (2, 81, 0)
+
+
+def _object_pointers(struct):
+    # objects referred to by the pointer properties of struct
+    for prop in struct.bl_rna.properties:
+        if prop.type == "POINTER":
+            value = getattr(struct, prop.identifier, None)
+            if isinstance(value, bpy.types.Object):
+                yield value
+
+
+def _driver_objects(id_data):
+    ad = getattr(id_data, "animation_data", None)
+    if ad is None:
+        return
+    for fc in ad.drivers:
+        for variable in fc.driver.variables:
+            for target in variable.targets:
+                if isinstance(target.id, bpy.types.Object):
+                    yield target.id
+
+
+def _depends_on(obj):
+    # objects whose evaluation obj needs
+    if obj.parent is not None:
+        yield obj.parent
+    for constraint in obj.constraints:
+        yield from _object_pointers(constraint)
+        # targets of armature constraints
+        for target in getattr(constraint, "targets", ()):
+            yield from _object_pointers(target)
+    for modifier in obj.modifiers:
+        yield from _object_pointers(modifier)
+    for id_data in (obj, obj.data, getattr(obj.data, "shape_keys", None)):
+        yield from _driver_objects(id_data)
+    if obj.data is not None:
+        yield from _object_pointers(obj.data)
+
+
+def _isolable(obj):
+    if getattr(obj, "rigid_body", None) is not None or getattr(obj, "rigid_body_constraint", None) is not None:
+        return False
+    if len(getattr(obj, "particle_systems", ())) > 0:
+        return False
+    return not any(modifier.type in SIMULATION_MODIFIERS for modifier in obj.modifiers)
+
+
+def dependencies(objs):
+    # objs and every object they depend on, directly or not. None if one of
+    # them can not be evaluated apart from its scene
+    found = []
+    seen = set()
+    stack = list(objs)
+    while stack:
+        obj = stack.pop()
+        if obj in seen:
+            continue
+        if not _isolable(obj):
+            return None
+        seen.add(obj)
+        found.append(obj)
+        stack.extend(_depends_on(obj))
+    return found
+
+
+@contextlib.contextmanager
+def isolated(context, objs):
+    # yields (scene, depsgraph): the scene whose frames the samplers set and
+    # the depsgraph to read evaluated objects from, None to read the objects
+    # themselves. without save_keyframes_isolate, the scene of context
+    scene = context.scene
+    closure = None
+    if scene.save_keyframes_isolate and supported():
+        closure = dependencies(objs)
+    if closure is None:
+        yield scene, None
+        return
+    temporary = bpy.data.scenes.new(SCENE_NAME)
+    try:
+        with profiling.phase("isolate"):
+            temporary.render.fps = scene.render.fps
+            temporary.render.fps_base = scene.render.fps_base
+            temporary.render.use_simplify = scene.render.use_simplify
+            temporary.render.simplify_subdivision = scene.render.simplify_subdivision
+            for obj in closure:
+                if bpy.app.version < (2, 80, 0):
+                    temporary.objects.link(obj)
+                else:
+                    temporary.collection.objects.link(obj)
+            # evaluated once, objects read without setting a frame are valid
+            temporary.frame_set(scene.frame_current)
+            depsgraph = None if bpy.app.version < (2, 80, 0) else temporary.view_layers[0].depsgraph
+        profiling.count("isolated", len(closure))
+        yield temporary, depsgraph
+    finally:
+        bpy.data.scenes.remove(temporary, do_unlink=True)
@@ -0,0 +1,139 @@
+"""
+time-sliced exports run from a timer, so the ui stays responsive.
+
+exporters mixing in ModalExport define export(context), a generator writing
+the output file and yielding (frames done, frames total, frames written)
+after every frame. frames are written after they are all sampled by adaptive
+and parallel exports, until then none are written. execute() runs it to the
+end, or, with save_keyframes_modal set, for SLICE seconds per timer event
+while the status bar shows the progress. esc closes the generator: the output
+file keeps the frames written so far. undo, redo and file loads free the data
+a running export refers to, so they close it first.
+"""
+
+import time
+
+import bpy
+
+from . import profiling
+
+# seconds of export per timer event
+SLICE = 0.1
+TIMER_INTERVAL = 0.01
+# exports running from a timer
+_running = []
+
+
+def status_text(context, text):
+    # text in the status bar (header of the area before 2.80), None clears it
+    if getattr(context, "workspace", None) is not None:
+        context.workspace.status_text_set(text)
+    elif getattr(context, "area", None) is not None:
+        context.area.header_text_set(text)
+
+
+def restore_frame(scene, frame):
+    # frame_set() only if the export changed the frame
+    if scene.frame_current != frame:
+        scene.frame_set(frame)
+
+
+@bpy.app.handlers.persistent
+def _abort_running(*args):
+    for export in list(_running):
+        export.abort(bpy.context)
+
+
+def _handler_lists():
+    handlers = bpy.app.handlers
+    return [getattr(handlers, name) for name in ("undo_pre", "redo_pre", "load_pre")
+            if hasattr(handlers, name)]
+
+
+def register():
+    for handlers in _handler_lists():
+        if _abort_running not in handlers:
+            handlers.append(_abort_running)
+
+
+def unregister():
+    for handlers in _handler_lists():
+        if _abort_running in handlers:
+            handlers.remove(_abort_running)
+
+
+class ModalExport:
+
+    def execute(self, context):
+        self._frame_initial = context.scene.frame_current
+        profiling.begin(context.scene, self.bl_label)
+        if not context.scene.save_keyframes_modal or bpy.app.background:
+            try:
+                for _ in self.export(context):
+                    pass
+            except BaseException:
+                profiling.abort()
+                raise
+            finally:
+                restore_frame(context.scene, self._frame_initial)
+            profiling.end(self, context.scene)
+            return {"FINISHED"}
+        self._steps = self.export(context)
+        self._progress = (0, 0, 0)
+        self._aborted = False
+        self._started = time.perf_counter()
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(TIMER_INTERVAL, window=context.window)
+        wm.modal_handler_add(self)
+        _running.append(self)
+        return {"RUNNING_MODAL"}
+
+    def modal(self, context, event):
+        if self._aborted:
+            return {"CANCELLED"}
+        if event.type == "ESC" and event.value == "PRESS":
+            self.finish(context)
+            self.report({"WARNING"}, self._cancelled_text("Export cancelled"))
+            return {"CANCELLED"}
+        if event.type != "TIMER":
+            return {"PASS_THROUGH"}
+        # at least one step per event, then steps until the slice is used
+        deadline = time.perf_counter() + SLICE
+        try:
+            self._progress = next(self._steps)
+            while time.perf_counter() < deadline:
+                self._progress = next(self._steps)
+        except StopIteration:
+            self.finish(context)
+            return {"FINISHED"}
+        except Exception as e:
+            profiling.abort()
+            self.finish(context)
+            self.report({"ERROR"}, str(e))
+            return {"CANCELLED"}
+        done, total, written = self._progress
+        elapsed = time.perf_counter() - self._started
+        left = elapsed / done * (total - done) if done else 0.0
+        status_text(context, "{}: {} / {} frames, {:.0f} s left, Esc to cancel".format(
+            self.bl_label, done, total, left))
+        return {"RUNNING_MODAL"}
+
+    def abort(self, context):
+        # finishes before an undo, redo or file load, the next event cancels
+        self.finish(context)
+        self._aborted = True
+        self.report({"WARNING"}, self._cancelled_text("Export cancelled by undo or file load"))
+
+    def _cancelled_text(self, text):
+        done, total, written = self._progress
+        return "{}, {} of {} frames written.".format(text, written, total)
+
+    def finish(self, context):
+        # closes the output file, restores the frame and the hidden objects
+        if self in _running:
+            _running.remove(self)
+        self._steps.close()
+        context.window_manager.event_timer_remove(self._timer)
+        status_text(context, None)
+        restore_frame(context.scene, self._frame_initial)
+        profiling.end(self, context.scene)
@@ -0,0 +1,325 @@
+"""
+pool of background blender processes running export jobs.
+
+    python path/to/add-on/pool.py --blender /path/to/blender --workers 4 \
+        --jobs jobs.json --report report.json
+
+blender startup, add-on registration and the loading of a .blend file are
+paid once per worker instead of once per job. every worker runs
+`blender -b --python __main__.py -- --serve <address>` (see cli.serve()),
+connects back to the pool and runs the jobs it is sent, one json object per
+line with the option names of cli.py as keys ("blend" is required), answering
+with the record of cli.run_job().
+
+a worker keeps the last .blend file it loaded open. an idle worker takes
+the first of the next LOOKAHEAD jobs whose file it has open, the remaining
+jobs go in order to the idle workers whose files were used least recently, so
+the files open in the pool are an lru cache of the recent .blend files. the
+oldest job is not passed over more than LOOKAHEAD times. a worker which dies
+is started again, its job fails.
+
+--jobs - reads jobs from stdin, one json object per line, and writes every
+record to stdout as one json line as soon as it is done, so the pool can
+serve the jobs of another process until stdin is closed.
+
+this module does not import bpy nor the add-on, it runs with any python 3.
+"""
+
+import argparse
+import binascii
+import collections
+import itertools
+import json
+import os
+import queue
+import selectors
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__main__.py")
+# environment variable with the token a worker sends back, see cli.serve()
+TOKEN_VARIABLE = "SAVE_KEYFRAMES_POOL_TOKEN"
+# seconds a started worker has to connect back
+STARTUP_TIMEOUT = 300.0
+# seconds between checks for new jobs while every worker is busy
+POLL_INTERVAL = 0.05
+# pending jobs searched for one whose file an idle worker has open
+LOOKAHEAD = 64
+
+
+class Worker:
+
+    def __init__(self, index, process, log):
+        self.index = index
+        self.process = process
+        self.log = log
+        self.connection = None
+        self.reader = None
+        self.writer = None
+        # absolute path of the open .blend file, time it was last used
+        self.blend = None
+        self.used = 0.0
+        # (job number, job, time queued, time sent) of the running job
+        self.running = None
+
+    def send(self, number, job, queued):
+        self.running = (number, job, queued, time.perf_counter())
+        self.blend = os.path.abspath(job["blend"])
+        self.used = time.perf_counter()
+        self.writer.write(json.dumps(job) + "\n")
+        self.writer.flush()
+
+    def close(self):
+        for f in (self.reader, self.writer, self.connection):
+            if f is not None:
+                try:
+                    f.close()
+                except OSError:
+                    pass
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        if self.log is not None:
+            self.log.close()
+
+
+class Pool:
+
+    def __init__(self, blender, workers, logs=None):
+        self.blender = blender
+        self.logs = logs
+        self.token = binascii.hexlify(os.urandom(16)).decode("ascii")
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(workers)
+        self.selector = selectors.DefaultSelector()
+        self.workers = []
+        try:
+            for i in range(workers):
+                self.workers.append(self._spawn(i))
+            self._connect(self.workers)
+        except BaseException:
+            self.close()
+            raise
+
+    def _spawn(self, index):
+        host, port = self.listener.getsockname()
+        command = [self.blender, "-b", "--python-exit-code", "1", "--python", MAIN, "--",
+                   "--serve", "{}:{}".format(host, port)]
+        env = dict(os.environ)
+        env[TOKEN_VARIABLE] = self.token
+        log = None
+        if self.logs is not None:
+            log = open(os.path.join(self.logs, "worker_{:02d}.log".format(index)), "a")
+        process = subprocess.Popen(command, env=env, stdin=subprocess.DEVNULL,
+                                   stdout=log or subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        return Worker(index, process, log)
+
+    def _connect(self, workers):
+        # accepts a connection per started worker, matched by the pid it sends
+        waiting = {worker.process.pid: worker for worker in workers}
+        deadline = time.perf_counter() + STARTUP_TIMEOUT
+        while waiting:
+            for worker in waiting.values():
+                if worker.process.poll() is not None:
+                    raise Exception("Worker {} exited with {} before connecting.".format(
+                        worker.index, worker.process.returncode))
+            self.listener.settimeout(min(1.0, max(0.0, deadline - time.perf_counter())))
+            try:
+                connection, _ = self.listener.accept()
+            except socket.timeout:
+                if time.perf_counter() >= deadline:
+                    raise Exception("Workers did not connect within {} s.".format(STARTUP_TIMEOUT))
+                continue
+            connection.settimeout(STARTUP_TIMEOUT)
+            reader = connection.makefile("r", encoding="utf-8")
+            try:
+                hello = json.loads(reader.readline() or "{}")
+            except ValueError:
+                hello = {}
+            worker = waiting.get(hello.get("pid"))
+            if worker is None or hello.get("token") != self.token:
+                reader.close()
+                connection.close()
+                continue
+            connection.settimeout(None)
+            worker.connection = connection
+            worker.reader = reader
+            worker.writer = connection.makefile("w", encoding="utf-8")
+            self.selector.register(connection, selectors.EVENT_READ, worker)
+            del waiting[worker.process.pid]
+
+    def _restart(self, worker):
+        self.selector.unregister(worker.connection)
+        worker.close()
+        self.workers[worker.index] = self._spawn(worker.index)
+        self._connect([self.workers[worker.index]])
+
+    def _assign(self, pending, idle):
+        # [(worker, entry), ...] for the idle workers, see the module docstring.
+        # entry: [job number, job, time queued, blend, times passed over]
+        assigned = []
+        if pending[0][4] < LOOKAHEAD:
+            for entry in list(itertools.islice(pending, LOOKAHEAD)):
+                worker = next((w for w in idle if w.blend == entry[3]), None)
+                if worker is None:
+                    continue
+                if entry is not pending[0]:
+                    pending[0][4] += 1
+                pending.remove(entry)
+                idle.remove(worker)
+                assigned.append((worker, entry))
+                if not idle or not pending:
+                    return assigned
+        while pending and idle:
+            worker = min(idle, key=lambda worker: worker.used)
+            idle.remove(worker)
+            assigned.append((worker, pending.popleft()))
+        return assigned
+
+    def run(self, jobs):
+        # yields the record of every job of the iterable jobs, in the order
+        # they finish. jobs is read by a thread, so it may block (stdin)
+        incoming = queue.Queue()
+
+        def feed():
+            try:
+                for job in jobs:
+                    incoming.put(job)
+            finally:
+                incoming.put(None)
+
+        threading.Thread(target=feed, name="save_keyframes_pool_feed", daemon=True).start()
+        pending = collections.deque()
+        number = 0
+        more = True
+        while more or pending or any(worker.running for worker in self.workers):
+            while more:
+                try:
+                    job = incoming.get(block=not pending and not any(w.running for w in self.workers))
+                except queue.Empty:
+                    break
+                if job is None:
+                    more = False
+                    break
+                number += 1
+                if not job.get("blend"):
+                    yield self._failed(number - 1, job, time.perf_counter(), None,
+                                       "Jobs of a pool need a blend file.")
+                    continue
+                pending.append([number - 1, job, time.perf_counter(), os.path.abspath(job["blend"]), 0])
+            idle = [worker for worker in self.workers if worker.running is None]
+            for worker, (n, job, queued, _, _) in self._assign(pending, idle) if pending and idle else ():
+                try:
+                    worker.send(n, job, queued)
+                except OSError:
+                    yield self._failed(n, job, queued, worker, "Worker {} is gone.".format(worker.index))
+                    self._restart(worker)
+            if not any(worker.running for worker in self.workers):
+                continue
+            for key, _ in self.selector.select(POLL_INTERVAL if more else None):
+                worker = key.data
+                line = worker.reader.readline()
+                n, job, queued, sent = worker.running
+                worker.running = None
+                if not line:
+                    yield self._failed(n, job, queued, worker, "Worker {} exited with {}.".format(
+                        worker.index, worker.process.wait()))
+                    self._restart(worker)
+                    continue
+                record = json.loads(line)
+                now = time.perf_counter()
+                record.update(job=n, worker=worker.index, queued_seconds=sent - queued,
+                              latency_seconds=now - queued)
+                yield record
+
+    def _failed(self, number, job, queued, worker, error):
+        return {"job": number, "blend": job.get("blend"), "exporter": job.get("exporter"),
+                "worker": None if worker is None else worker.index, "status": "FAILED",
+                "error": error, "loaded": False, "seconds": 0.0, "bytes": 0,
+                "queued_seconds": 0.0, "latency_seconds": time.perf_counter() - queued}
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+        self.selector.close()
+        self.listener.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def summary(records, seconds):
+    # throughput and latency of the jobs run by a pool in seconds
+    latencies = [r["latency_seconds"] for r in records]
+    return {
+        "jobs": len(records),
+        "failed": sum(r["status"] != "FINISHED" for r in records),
+        "loaded": sum(bool(r.get("loaded")) for r in records),
+        "seconds": seconds,
+        "jobs_per_second": len(records) / seconds if seconds else 0.0,
+        "bytes_per_second": sum(r["bytes"] for r in records) / seconds if seconds else 0.0,
+        "latency_mean": sum(latencies) / len(latencies) if latencies else 0.0,
+        "latency_p50": _percentile(latencies, 0.5),
+        "latency_p95": _percentile(latencies, 0.95),
+        "latency_max": max(latencies) if latencies else 0.0,
+    }
+
+
+def read_jobs(path):
+    if path == "-":
+        return (json.loads(line) for line in sys.stdin if line.strip())
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(
+        prog="save_object_keyframes_pool",
+        description="Run save object keyframes jobs on a pool of background blender processes.")
+    p.add_argument("--blender", default="blender", help="blender executable")
+    p.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    p.add_argument("--jobs", required=True,
+                   help="json file with a list of jobs, or - for one json job per line on stdin")
+    p.add_argument("--report", help="write the records of the jobs and the summary to this json file")
+    p.add_argument("--logs", help="directory of the output of every worker")
+    args = p.parse_args(argv)
+    stream = args.jobs == "-"
+    records = []
+    start = time.perf_counter()
+    with Pool(args.blender, max(1, args.workers), args.logs) as pool:
+        for record in pool.run(read_jobs(args.jobs)):
+            records.append(record)
+            if stream:
+                print(json.dumps(record), flush=True)
+                continue
+            print("save_object_keyframes pool: {} {} {} on worker {} ({:.3f} s, {:.3f} s latency{})".format(
+                record["status"], record["exporter"], record.get("output", record["blend"]),
+                record["worker"], record["seconds"], record["latency_seconds"],
+                ", loaded" if record.get("loaded") else ""))
+            if "error" in record:
+                print(record["error"], file=sys.stderr)
+    stats = summary(records, time.perf_counter() - start)
+    print("save_object_keyframes pool: {jobs} jobs, {failed} failed, {loaded} .blend loads, "
+          "{jobs_per_second:.2f} jobs/s, {bytes_per_second:.0f} bytes/s, latency mean "
+          "{latency_mean:.3f} s, p95 {latency_p95:.3f} s".format(**stats),
+          file=sys.stderr if stream else sys.stdout)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"jobs": records, "summary": stats}, f, indent=2)
+    return int(any(r["status"] != "FINISHED" for r in records))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+opt-in profiling of the exports.
+
+with save_keyframes_profile set, every export records the wall-clock time and
+calls of its phases (selection, frame_set, to_mesh, formatting, writes, ...),
+counters such as the rows written, the bytes of the output file and the peak
+of memory allocated through python (tracemalloc, numpy arrays included). the
+summary is reported by the operator, save_keyframes_profile_json also writes
+it to `<output file>.profile.json`.
+
+phases count their own time only: a phase running inside another one is
+subtracted from the outer phase, so the phases add up to at most the total.
+the rest is reported as "other".
+
+phase() and count() do nothing when no export is profiled. tracemalloc slows
+down python code, compare phases of profiled runs with each other.
+"""
+
+import functools
+import json
+import os
+import time
+import tracemalloc
+
+# profile of the running export, None when not profiled
+current = None
+# profile of the last finished export
+last = None
+
+
+class _NoPhase:
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+class Profile:
+
+    def __init__(self, name):
+        self.name = name
+        self.phases = {}
+        self.counters = {}
+        self.output = None
+        self.bytes = 0
+        self.peak_bytes = 0
+        self.seconds = 0.0
+        # seconds of the inner phases of every running phase
+        self.stack = []
+        self.traced = tracemalloc.is_tracing()
+        if self.traced and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.seconds = time.perf_counter() - self.started
+        self.peak_bytes = tracemalloc.get_traced_memory()[1]
+        if not self.traced:
+            tracemalloc.stop()
+        if self.output is not None and os.path.exists(self.output):
+            self.bytes = os.path.getsize(self.output)
+
+    def as_dict(self):
+        return {
+            "operator": self.name,
+            "seconds": self.seconds,
+            "phases": {name: {"seconds": seconds, "calls": calls}
+                       for name, (seconds, calls) in self.phases.items()},
+            "counters": self.counters,
+            "output": self.output,
+            "bytes": self.bytes,
+            "peak_bytes": self.peak_bytes,
+        }
+
+    def summary(self):
+        phases = sorted(self.phases.items(), key=lambda item: -item[1][0])
+        other = self.seconds - sum(seconds for seconds, _ in self.phases.values())
+        phases.append(("other", (max(other, 0.0), 1)))
+        return "{:.3f} s: {}; {}; {} bytes written, peak {:.1f} MB".format(
+            self.seconds,
+            ", ".join("{} {:.3f} s ({})".format(name, seconds, calls)
+                      for name, (seconds, calls) in phases),
+            ", ".join("{} {}".format(name, value) for name, value in sorted(self.counters.items())),
+            self.bytes, self.peak_bytes / (1 << 20))
+
+
+class _Phase:
+
+    __slots__ = ("profile", "name", "started")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile.stack.append(0.0)
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        profile = self.profile
+        inner = profile.stack.pop()
+        if profile.stack:
+            profile.stack[-1] += elapsed
+        seconds, calls = profile.phases.get(self.name, (0.0, 0))
+        profile.phases[self.name] = (seconds + elapsed - inner, calls + 1)
+
+
+def phase(name):
+    # context manager timing a phase of the profiled export
+    if current is None:
+        return _NO_PHASE
+    return _Phase(current, name)
+
+
+def count(name, n=1):
+    if current is not None:
+        current.counters[name] = current.counters.get(name, 0) + n
+
+
+def output_file(filepath):
+    # file written by the profiled export
+    if current is not None:
+        current.output = filepath
+
+
+def instrument(writer):
+    # writer of formats.py timed while profiling: write() as "format",
+    # flush() and close() as "write", the rows written counted
+    if current is None:
+        return writer
+    output_file(writer.filepath)
+    write, flush, close = writer.write, writer.flush, writer.close
+
+    def timed_write(ids, frames, values, key=None):
+        count("rows", len(values))
+        with phase("format"):
+            write(ids, frames, values, key)
+
+    def timed_flush():
+        with phase("write"):
+            flush()
+
+    def timed_close():
+        with phase("write"):
+            close()
+
+    writer.write, writer.flush, writer.close = timed_write, timed_flush, timed_close
+    return writer
+
+
+def begin(scene, name):
+    # starts profiling an export if save_keyframes_profile is set
+    global current
+    current = Profile(name) if scene.save_keyframes_profile else None
+
+
+def end(op, scene):
+    # stops profiling, reports the summary through op and writes the json
+    # sidecar next to the output file
+    global current, last
+    profile, current = current, None
+    if profile is None:
+        return
+    profile.stop()
+    last = profile
+    op.report({"INFO"}, "{} {}".format(profile.name, profile.summary()))
+    if scene.save_keyframes_profile_json and profile.output is not None:
+        with open(profile.output + ".profile.json", "w", encoding="utf-8") as f:
+            json.dump(profile.as_dict(), f, indent=2)
+
+
+def abort():
+    global current
+    if current is not None:
+        current.stop()
+    current = None
+
+
+def profiled(execute):
+    # execute of an operator run under a profile
+    @functools.wraps(execute)
+    def wrapper(self, context):
+        begin(context.scene, self.bl_label)
+        try:
+            result = execute(self, context)
+        except BaseException:
+            abort()
+            raise
+        end(self, context.scene)
+        return result
+    return wrapper
@@ -0,0 +1,551 @@
+"""
+frame-major sampling shared by the exporters.
+
+scene.frame_set() re-evaluates the whole depsgraph, so the exporters set each
+frame exactly once and read every matched object in that single pass instead
+of looping objects first and frames second.
+
+objects whose transform only comes from their own action are not read from
+the depsgraph at all: their f-curves are evaluated over a chunk of frames and
+matrix_world is composed from the values (see is_keyframe_driven()).
+
+the matrices of all the objects read at a frame are gathered into one array
+and decomposed in a single numpy pass (decompose()), into euler angles,
+quaternions or the matrix itself (ROTATIONS).
+
+static objects and meshes (is_static(), is_static_mesh()) are read once and
+their row repeated. writers reuse the formatted values of rows which did not
+change since the previous frame (see formats.CsvWriter.write()).
+
+the samplers set the frames of the scene they are given. with a depsgraph,
+objects are read from it instead of the objects themselves, see isolation.py.
+"""
+
+from itertools import repeat
+
+import bpy
+import numpy as np
+
+from . import profiling
+
+TRANSFORM_PATHS = ("location", "rotation_euler", "scale")
+EULER_ORDERS = ("XYZ", "XZY", "YXZ", "YZX", "ZXY", "ZYX")
+# axes (i, j, k) and parity of each euler order, RotOrderInfo of blenlib
+EULER_AXES = {
+    "XYZ": ((0, 1, 2), False), "XZY": ((0, 2, 1), True), "YXZ": ((1, 0, 2), True),
+    "YZX": ((1, 2, 0), False), "ZXY": ((2, 0, 1), False), "ZYX": ((2, 1, 0), True)}
+ROTATIONS = (
+    ("EULER", "Euler", "Location, XYZ euler angles and scale, like Matrix.to_euler()"),
+    ("QUATERNION", "Quaternion", "Location, w x y z quaternion and scale, continuous over the frames"),
+    ("MATRIX", "Matrix", "The upper three rows of matrix_world, row by row"),
+)
+# values of a transform row of each rotation
+TRANSFORM_WIDTHS = {"EULER": 9, "QUATERNION": 10, "MATRIX": 12}
+# below this cos(y), euler angles are in gimbal lock (16 * FLT_EPSILON)
+GIMBAL_EPSILON = 16.0 * 1.1920929e-07
+# animated properties which change matrix_world besides TRANSFORM_PATHS
+OTHER_TRANSFORM_PATHS = (
+    "rotation_mode", "rotation_quaternion", "rotation_axis_angle",
+    "delta_location", "delta_rotation_euler", "delta_rotation_quaternion", "delta_scale")
+# frames of f-curves evaluated at once for keyframe driven objects
+ANALYTIC_CHUNK = 256
+# modifiers whose result does not change over the frames unless their
+# properties are animated
+STATIC_MODIFIERS = (
+    "ARRAY", "BEVEL", "DECIMATE", "EDGE_SPLIT", "MIRROR", "MULTIRES", "REMESH", "SCREW",
+    "SKIN", "SMOOTH", "SOLIDIFY", "SUBSURF", "TRIANGULATE", "WELD", "WEIGHTED_NORMAL",
+    "WIREFRAME")
+
+
+def export_frames(start_frame, end_frame, interval):
+    # frames sampled every `interval`, the end frame is always included
+    frames = list(range(start_frame, end_frame + 1, interval))
+    if frames and frames[-1] != end_frame:
+        frames.append(end_frame)
+    return frames
+
+
+def keyframe_points(fc):
+    # (frames, values) of the keyframes of fc, float32 arrays
+    co = np.empty(len(fc.keyframe_points) * 2, dtype=np.float32)
+    fc.keyframe_points.foreach_get("co", co)
+    return co[0::2], co[1::2]
+
+
+def keyed_frames(frames, start_frame, end_frame):
+    # keyframe frames between start_frame and end_frame, truncated to int
+    inside = (frames >= start_frame) & (frames <= end_frame)
+    return frames[inside].astype(np.int64), inside
+
+
+def keyframe_frames(fcurves, data_paths, start_frame, end_frame):
+    # sorted unique frames keyed by the f-curves whose data path ends with one
+    # of data_paths
+    frames = [keyframe_points(fc)[0] for fc in fcurves if fc.data_path.endswith(data_paths)]
+    if not frames:
+        return []
+    return np.unique(keyed_frames(np.concatenate(frames), start_frame, end_frame)[0]).tolist()
+
+
+def interpolation_ratios(error, position_tolerance, rotation_tolerance, rotation="EULER"):
+    # largest error of each row of transform values against its tolerance:
+    # location and scale by distance, euler angles each, the angle between
+    # quaternions (twice the length of a small difference), the columns of
+    # the 3x3 part of a matrix by length
+    if rotation == "MATRIX":
+        error = error.reshape(len(error), 3, 4)
+        return np.maximum(
+            np.linalg.norm(error[:, :, 3], axis=1) / position_tolerance,
+            np.linalg.norm(error[:, :, :3], axis=1).max(axis=1) / rotation_tolerance)
+    if rotation == "QUATERNION":
+        angle = 2.0 * np.linalg.norm(error[:, 3:7], axis=1)
+    else:
+        angle = np.abs(error[:, 3:6]).max(axis=1)
+    return np.maximum.reduce([
+        np.linalg.norm(error[:, 0:3], axis=1) / position_tolerance,
+        angle / rotation_tolerance,
+        np.linalg.norm(error[:, -3:], axis=1) / position_tolerance])
+
+
+def adaptive_frames(frames, rows, position_tolerance, rotation_tolerance, rotation="EULER"):
+    # mask of the frames to keep so that rows interpolated linearly between
+    # the kept frames stay within the tolerances at every frame, see
+    # interpolation_ratios(). rows: (frames, columns) transform rows of one
+    # object, of the given rotation
+    frames = np.asarray(frames, dtype=np.float64)
+    keep = np.zeros(len(frames), dtype=bool)
+    if len(frames) == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    # douglas-peucker: split segments at their largest error until every
+    # error is within the tolerances
+    segments = [(0, len(frames) - 1)]
+    while segments:
+        a, b = segments.pop()
+        if b - a < 2:
+            continue
+        t = ((frames[a + 1:b] - frames[a]) / (frames[b] - frames[a]))[:, None]
+        error = rows[a + 1:b] - (rows[a] + (rows[b] - rows[a]) * t)
+        ratio = interpolation_ratios(error, position_tolerance, rotation_tolerance, rotation)
+        k = int(np.argmax(ratio))
+        if ratio[k] > 1.0:
+            keep[a + 1 + k] = True
+            segments += [(a, a + 1 + k), (a + 1 + k, b)]
+    return keep
+
+
+def animated_ancestors(objs):
+    # {object name: the object or its nearest ancestor with an action, None
+    # if there is none}. objects of a chain are walked only once
+    index = {}
+    for obj in objs:
+        path = []
+        node = obj
+        while node is not None and node.name not in index:
+            ad = node.animation_data
+            if ad is not None and ad.action is not None:
+                index[node.name] = node
+                break
+            path.append(node.name)
+            node = node.parent
+        ancestor = None if node is None else index[node.name]
+        for name in path:
+            index[name] = ancestor
+    return index
+
+
+def sample_frames(scene, frames):
+    # set each frame once, callers read all the objects they need per frame
+    for frame in frames:
+        with profiling.phase("frame_set"):
+            scene.frame_set(frame)
+        yield frame
+
+
+def matrix_world(obj, depsgraph=None):
+    # matrix_world of obj, evaluated in depsgraph when it is not the one of
+    # the context
+    if depsgraph is None:
+        return obj.matrix_world
+    return obj.evaluated_get(depsgraph).matrix_world
+
+
+def _eulers(r):
+    # (n, 3) xyz euler angles of the normalized (n, 3, 3) matrices r, like
+    # mat3_normalized_to_eul of blenlib: of the two solutions, the one with
+    # the smallest sum of absolute angles
+    cy = np.hypot(r[:, 0, 0], r[:, 1, 0])
+    e1 = np.stack([np.arctan2(r[:, 2, 1], r[:, 2, 2]),
+                   np.arctan2(-r[:, 2, 0], cy),
+                   np.arctan2(r[:, 1, 0], r[:, 0, 0])], axis=1)
+    e2 = np.stack([np.arctan2(-r[:, 2, 1], -r[:, 2, 2]),
+                   np.arctan2(-r[:, 2, 0], -cy),
+                   np.arctan2(-r[:, 1, 0], -r[:, 0, 0])], axis=1)
+    locked = cy <= GIMBAL_EPSILON
+    if locked.any():
+        e1[locked, 0] = np.arctan2(-r[locked, 1, 2], r[locked, 1, 1])
+        e1[locked, 2] = 0.0
+        e2[locked] = e1[locked]
+    a1 = np.abs(e1)
+    a2 = np.abs(e2)
+    second = a1[:, 0] + a1[:, 1] + a1[:, 2] > a2[:, 0] + a2[:, 1] + a2[:, 2]
+    return np.where(second[:, None], e2, e1)
+
+
+def _quaternions(r):
+    # (n, 4) w x y z quaternions of the normalized (n, 3, 3) matrices r, like
+    # mat3_normalized_to_quat of blenlib, w >= 0
+    n = len(r)
+    m00, m11, m22 = r[:, 0, 0], r[:, 1, 1], r[:, 2, 2]
+    q = np.empty((n, 4))
+    # the largest of w, x, y, z is computed from the diagonal, the others
+    # from the off-diagonal values
+    tr = 0.25 * (1.0 + m00 + m11 + m22)
+    w = tr > 1e-4
+    x = ~w & (m00 > m11) & (m00 > m22)
+    y = ~w & ~x & (m11 > m22)
+    z = ~w & ~x & ~y
+    s = np.sqrt(tr[w])
+    q[w, 0] = s
+    s = 0.25 / s
+    q[w, 1] = (r[w, 2, 1] - r[w, 1, 2]) * s
+    q[w, 2] = (r[w, 0, 2] - r[w, 2, 0]) * s
+    q[w, 3] = (r[w, 1, 0] - r[w, 0, 1]) * s
+    # mask, largest component i, q[0] from r[a, b] - r[b, a], the other two
+    # components k from the sums of r[c, e] and r[e, c]
+    for mask, i, (a, b), others in (
+            (x, 1, (2, 1), ((2, 0, 1), (3, 0, 2))),
+            (y, 2, (0, 2), ((1, 0, 1), (3, 1, 2))),
+            (z, 3, (1, 0), ((1, 0, 2), (2, 1, 2)))):
+        if not mask.any():
+            continue
+        d = i - 1
+        s = 2.0 * np.sqrt(1.0 + r[mask, d, d] - r[mask, (d + 1) % 3, (d + 1) % 3]
+                          - r[mask, (d + 2) % 3, (d + 2) % 3])
+        q[mask, i] = 0.25 * s
+        s = 1.0 / s
+        q[mask, 0] = (r[mask, a, b] - r[mask, b, a]) * s
+        for k, c, e in others:
+            q[mask, k] = (r[mask, c, e] + r[mask, e, c]) * s
+    negative = q[:, 0] < 0.0
+    q[negative] = 0.0 - q[negative]
+    length = np.sqrt((q * q).sum(axis=1))
+    return q / np.where(length == 0.0, 1.0, length)[:, None]
+
+
+def decompose(matrices, rotation="EULER"):
+    # (n, TRANSFORM_WIDTHS[rotation]) transform rows of n 4x4 matrices in one
+    # pass: location, rotation and scale like Matrix.to_translation(),
+    # to_euler() or to_quaternion() and to_scale(), or the upper three rows
+    # of the matrices. matrices: (n, 4, 4) array or sequence of Matrix
+    m = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+    if rotation == "MATRIX":
+        return m[:, :3, :].reshape(-1, 12)
+    rows = np.empty((len(m), TRANSFORM_WIDTHS[rotation]))
+    rows[:, 0:3] = m[:, :3, 3]
+    c = m[:, :3, :3]
+    scale = np.sqrt(c[:, 0, :] * c[:, 0, :] + c[:, 1, :] * c[:, 1, :] + c[:, 2, :] * c[:, 2, :])
+    rows[:, -3:] = scale
+    # normalized columns, a zero column stays zero
+    r = c / np.where(scale == 0.0, 1.0, scale)[:, None, :]
+    if rotation == "QUATERNION":
+        rows[:, 3:7] = _quaternions(r)
+    else:
+        rows[:, 3:6] = _eulers(r)
+    return rows
+
+
+def continuous_quaternions(rows, previous):
+    # negates the quaternions of the (n, 10) rows in the other hemisphere
+    # than the ones of previous, which are the same rotations, so that the
+    # values of an object do not jump between frames. in place
+    flip = (rows[:, 3:7] * previous[:, 3:7]).sum(axis=1) < 0.0
+    if flip.any():
+        # 0.0 - keeps zeros positive
+        rows[flip, 3:7] = 0.0 - rows[flip, 3:7]
+    return rows
+
+
+def euler_matrices(angles, order="XYZ"):
+    # (n, 3, 3) rotation matrices of the (n, 3) euler angles, like
+    # eulO_to_mat3 of blenlib
+    (i, j, k), parity = EULER_AXES[order]
+    t = angles[:, [i, j, k]]
+    if parity:
+        t = -t
+    ci, cj, ch = np.cos(t).T
+    si, sj, sh = np.sin(t).T
+    cc, cs, sc, ss = ci * ch, ci * sh, si * ch, si * sh
+    m = np.empty((len(angles), 3, 3))
+    m[:, i, i] = cj * ch
+    m[:, i, j] = sj * sc - cs
+    m[:, i, k] = sj * cc + ss
+    m[:, j, i] = cj * sh
+    m[:, j, j] = sj * ss + cc
+    m[:, j, k] = sj * cs - sc
+    m[:, k, i] = -sj
+    m[:, k, j] = cj * si
+    m[:, k, k] = cj * ci
+    return m
+
+
+def compose(values, order="XYZ"):
+    # (n, 4, 4) matrices of (n, 9) location, euler angles and scale values,
+    # Matrix.Translation() @ Euler().to_matrix() @ Matrix.Diagonal().
+    # + 0.0 gives the zeros of the matrix product, never -0.0
+    m = np.zeros((len(values), 4, 4))
+    m[:, :3, :3] = euler_matrices(values[:, 3:6], order) * values[:, None, 6:9]
+    m[:, :3, 3] = values[:, 0:3]
+    m[:, 3, 3] = 1.0
+    return m + 0.0
+
+
+def is_keyframe_driven(obj):
+    # True if matrix_world of obj only comes from the f-curves of its own
+    # action: no parent, constraints, drivers, nla, rigid body or delta transforms
+    if bpy.app.version < (2, 80, 0):
+        return False
+    if obj.parent is not None or len(obj.constraints) > 0:
+        return False
+    if obj.rotation_mode not in EULER_ORDERS or getattr(obj, "rigid_body", None) is not None:
+        return False
+    if (tuple(obj.delta_location) != (0.0, 0.0, 0.0)
+            or tuple(obj.delta_rotation_euler) != (0.0, 0.0, 0.0)
+            or tuple(obj.delta_scale) != (1.0, 1.0, 1.0)):
+        return False
+    ad = obj.animation_data
+    if ad is None:
+        return True
+    if len(ad.drivers) > 0 or len(ad.nla_tracks) > 0:
+        return False
+    if getattr(ad, "action_influence", 1.0) != 1.0 or getattr(ad, "action_blend_type", "REPLACE") != "REPLACE":
+        return False
+    if ad.action is not None:
+        for fc in ad.action.fcurves:
+            if fc.data_path in OTHER_TRANSFORM_PATHS:
+                return False
+    return True
+
+
+def is_static(obj):
+    # True if matrix_world of obj is the same at every frame: neither obj nor
+    # its parents are animated, driven or constrained, and no parent is a
+    # curve with animated data (path animation)
+    if len(obj.constraints) > 0 or getattr(obj, "rigid_body", None) is not None:
+        return False
+    ad = obj.animation_data
+    if ad is not None and (ad.action is not None or len(ad.drivers) > 0 or len(ad.nla_tracks) > 0):
+        return False
+    if obj.parent is None:
+        return True
+    if obj.parent_type != "OBJECT":
+        return False
+    if obj.parent.type == "CURVE" and is_animated_data(obj.parent.data):
+        return False
+    return is_static(obj.parent)
+
+
+def is_animated_data(id_data):
+    ad = getattr(id_data, "animation_data", None)
+    return ad is not None and (ad.action is not None or len(ad.drivers) > 0)
+
+
+def is_static_mesh(obj):
+    # True if the evaluated mesh of obj is the same at every frame: obj is
+    # static, its mesh and shape keys are not animated, and its modifiers are
+    # of STATIC_MODIFIERS without references to other objects
+    if not is_static(obj) or len(getattr(obj, "particle_systems", ())) > 0:
+        return False
+    if is_animated_data(obj.data) or is_animated_data(obj.data.shape_keys):
+        return False
+    for modifier in obj.modifiers:
+        if modifier.type not in STATIC_MODIFIERS:
+            return False
+        for prop in modifier.bl_rna.properties:
+            if prop.type == "POINTER" and isinstance(getattr(modifier, prop.identifier), bpy.types.Object):
+                return False
+    return True
+
+
+def analytic_transforms(obj, frames, rotation="EULER"):
+    # (frames, columns) rows of a keyframe driven obj at frames, computed
+    # without frame_set. quaternions are continuous over the frames.
+    # composed in float64 here, while blender's matrix_world is float32, so
+    # rows can differ from rows read from the depsgraph by about 1e-7
+    values = np.empty((len(frames), 9))
+    values[:] = tuple(obj.location) + tuple(obj.rotation_euler) + tuple(obj.scale)
+    ad = obj.animation_data
+    if ad is not None and ad.action is not None:
+        for fc in ad.action.fcurves:
+            if fc.data_path in TRANSFORM_PATHS and not fc.mute:
+                column = 3 * TRANSFORM_PATHS.index(fc.data_path) + fc.array_index
+                values[:, column] = [fc.evaluate(frame) for frame in frames]
+    rows = decompose(compose(values, obj.rotation_mode), rotation)
+    if rotation == "QUATERNION" and len(rows) > 1:
+        # a negative dot product with the previous row flips the sign of
+        # this and every later row
+        dot = (rows[1:, 3:7] * rows[:-1, 3:7]).sum(axis=1)
+        rows[1:, 3:7] = rows[1:, 3:7] * np.cumprod(np.where(dot < 0.0, -1.0, 1.0))[:, None] + 0.0
+    return rows
+
+
+def sample_transforms(scene, objs, frames, depsgraph=None, rotation="EULER"):
+    # yields (frame, rows): (objs, columns) array of the transform rows of
+    # objs in their order, see decompose(). a new array every frame.
+    # frames are only set when some object needs the depsgraph
+    width = TRANSFORM_WIDTHS[rotation]
+    static = [i for i, obj in enumerate(objs) if len(frames) > 0 and is_static(obj)]
+    driven = [is_keyframe_driven(obj) for obj in objs]
+    moving = sorted(set(range(len(objs))).difference(static))
+    analytic = [i for i in moving if driven[i]]
+    evaluated = [i for i in moving if not driven[i]]
+    # rows of static objects, composed like the other keyframe driven rows
+    static_rows = np.empty((len(static), width))
+    with profiling.phase("matrix_world"):
+        read = [k for k, i in enumerate(static) if not driven[i]]
+        if read:
+            static_rows[read] = decompose([objs[static[k]].matrix_world for k in read], rotation)
+        for k, i in enumerate(static):
+            if driven[i]:
+                static_rows[k] = analytic_transforms(objs[i], frames[:1], rotation)[0]
+    previous = None
+    for start in range(0, len(frames), ANALYTIC_CHUNK):
+        chunk = frames[start:start + ANALYTIC_CHUNK]
+        with profiling.phase("fcurves"):
+            # (analytic objects, frames of chunk, columns)
+            computed = np.array([analytic_transforms(objs[i], chunk, rotation) for i in analytic])
+        sampled = sample_frames(scene, chunk) if evaluated else chunk
+        for j, frame in enumerate(sampled):
+            rows = np.empty((len(objs), width))
+            rows[static] = static_rows
+            if analytic:
+                rows[analytic] = computed[:, j]
+            if evaluated:
+                with profiling.phase("matrix_world"):
+                    rows[evaluated] = decompose(
+                        [matrix_world(objs[i], depsgraph) for i in evaluated], rotation)
+            if rotation == "QUATERNION" and previous is not None:
+                continuous_quaternions(rows, previous)
+            previous = rows
+            yield frame, rows
+
+
+def sample_keyframe_transforms(scene, frames_of_objs, depsgraph=None, rotation="EULER"):
+    # frames_of_objs: [(obj, frames), ...] where every object has its own frames.
+    # yields (frame, [(obj, row), ...]) over the union of frames, frame asc.
+    # a frame is only set when an object which needs the depsgraph is keyed on it
+    objs_at = {}
+    with profiling.phase("fcurves"):
+        for obj, frames in frames_of_objs:
+            if is_keyframe_driven(obj):
+                rows = analytic_transforms(obj, frames, rotation)
+            else:
+                rows = repeat(None)
+            for frame, row in zip(frames, rows):
+                objs_at.setdefault(frame, []).append((obj, row))
+    # last quaternion row of every object read from the depsgraph
+    last = {}
+    for frame in sorted(objs_at):
+        entries = objs_at.pop(frame)
+        read = [k for k, (obj, row) in enumerate(entries) if row is None]
+        if read:
+            with profiling.phase("frame_set"):
+                scene.frame_set(frame)
+            with profiling.phase("matrix_world"):
+                rows = decompose([matrix_world(entries[k][0], depsgraph) for k in read], rotation)
+                if rotation == "QUATERNION":
+                    continuous_quaternions(rows, np.array(
+                        [last.get(entries[k][0].name, row) for k, row in zip(read, rows)]))
+                    last.update((entries[k][0].name, row) for k, row in zip(read, rows))
+                for k, row in zip(read, rows):
+                    entries[k] = (entries[k][0], row)
+        yield frame, entries
+
+
+def world_vertices(mesh, matrix, buffers=None):
+    # (n, 3) vertex coordinates of mesh transformed by matrix.
+    # copied with one foreach_get instead of one python object per vertex.
+    # buffers: dict keeping the arrays of the read between calls for the
+    # same object, they are reallocated only when the vertex count changes
+    n = len(mesh.vertices)
+    if buffers is None:
+        buffers = {}
+    co = buffers.get("co")
+    if co is None or len(co) != n:
+        co = buffers["co"] = np.empty((n, 3), dtype=np.float32)
+        buffers["world"] = np.empty((n, 3), dtype=np.float64)
+    world = buffers["world"]
+    mesh.vertices.foreach_get("co", co.reshape(-1))
+    m = np.array(matrix, dtype=np.float64)
+    np.matmul(co, m[:3, :3].T, out=world)
+    world += m[:3, 3]
+    # meshes store float32, keep the values the mesh.transform() path wrote.
+    # the result is a new array, writers may hold it until they flush
+    return world.astype(np.float32)
+
+
+def vertex_uvs(mesh, uv_layer):
+    # uv of every vertex, of the loops of a vertex the topmost uv, the
+    # leftmost of equal v. vertices without loops get nan
+    n = len(mesh.loops)
+    vertex_index = np.empty(n, dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", vertex_index)
+    uv = np.empty(n * 2, dtype=np.float32)
+    uv_layer.data.foreach_get("uv", uv)
+    uv = uv.reshape(n, 2)
+    # loops sorted by vertex, v descending, u ascending: the first loop of
+    # each vertex is the selected one
+    order = np.lexsort((uv[:, 0], -uv[:, 1], vertex_index))
+    vertices, first = np.unique(vertex_index[order], return_index=True)
+    uvs = np.full((len(mesh.vertices), 2), np.nan, dtype=np.float32)
+    uvs[vertices] = uv[order[first]]
+    return uvs
+
+
+def evaluated_vertices(context, obj, buffers=None, depsgraph=None, scene=None):
+    # world space vertices of obj with modifiers applied (preview settings).
+    # the evaluated mesh is freed before returning, so memory does not grow
+    # with the frames sampled. buffers: see world_vertices(), depsgraph:
+    # evaluated depsgraph of the frame, shared by the objects read at once,
+    # scene: scene evaluating obj before 2.80, the one of context by default
+    if bpy.app.version >= (2, 80, 0):
+        if depsgraph is None:
+            depsgraph = context.evaluated_depsgraph_get()
+        ob_eval = obj.evaluated_get(depsgraph)
+        with profiling.phase("to_mesh"):
+            mesh = ob_eval.to_mesh()
+        try:
+            with profiling.phase("vertices"):
+                return world_vertices(mesh, ob_eval.matrix_world, buffers)
+        finally:
+            ob_eval.to_mesh_clear()
+    # before 2.80 to_mesh() adds a mesh to bpy.data
+    with profiling.phase("to_mesh"):
+        mesh = obj.to_mesh(scene or context.scene, True, 'PREVIEW')
+    try:
+        with profiling.phase("vertices"):
+            return world_vertices(mesh, obj.matrix_world, buffers)
+    finally:
+        bpy.data.meshes.remove(mesh)
+
+
+def sample_vertices(context, objs, frames, scene=None, depsgraph=None):
+    # yields (frame, vertices), world space vertices of every object of objs.
+    # static meshes are read at the first frame and their array repeated,
+    # frames are not set when no other object is sampled. scene: scene whose
+    # frames are set, depsgraph: its depsgraph, see isolation.isolated()
+    scene = scene or context.scene
+    static = {i for i, obj in enumerate(objs) if is_static_mesh(obj)}
+    sampled = sample_frames(scene, frames) if len(static) < len(objs) else frames
+    buffers = [{} for obj in objs]
+    vertices = [None] * len(objs)
+    for frame in sampled:
+        # every mesh of the frame is read from the same evaluated depsgraph
+        if depsgraph is None and bpy.app.version >= (2, 80, 0):
+            frame_depsgraph = context.evaluated_depsgraph_get()
+        else:
+            frame_depsgraph = depsgraph
+        for i, obj in enumerate(objs):
+            if i not in static or vertices[i] is None:
+                vertices[i] = evaluated_vertices(context, obj, buffers[i], frame_depsgraph, scene)
+        yield frame, list(vertices)
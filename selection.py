@@ -0,0 +1,159 @@
+"""
+object selection shared by the exporters.
+
+objects are matched by the id key, a regular expression compiled once, then
+optionally filtered by collection, object type and animation (see select()).
+the (name, object) pairs of every scene and the objects matched by each id
+key are cached between exports. depsgraph updates of objects, collections or
+scenes, undo, redo and file loads clear the cache. before 2.80 there is no
+depsgraph update handler and nothing is cached.
+"""
+
+import functools
+import re
+
+import bpy
+
+from . import sampling
+
+# scene pointer: {"items": [(name, obj), ...], "matched": {id key: [obj, ...]}}
+_index = {}
+_cached = False
+UPDATED_TYPES = ("OBJECT", "COLLECTION", "SCENE")
+
+
+@functools.lru_cache(maxsize=64)
+def pattern(id_key):
+    return re.compile(id_key)
+
+
+def clear():
+    _index.clear()
+
+
+def object_types():
+    # enum items of every object type of the running blender (LAMP before
+    # 2.80, LIGHT since)
+    return [(item.identifier, item.name, item.description)
+            for item in bpy.types.Object.bl_rna.properties["type"].enum_items]
+
+
+@bpy.app.handlers.persistent
+def _on_depsgraph_update(*args):
+    # (scene) before 2.81, (scene, depsgraph) since
+    depsgraph = args[1] if len(args) > 1 else None
+    if depsgraph is None or any(depsgraph.id_type_updated(t) for t in UPDATED_TYPES):
+        clear()
+
+
+@bpy.app.handlers.persistent
+def _on_reload(*args):
+    # undo and file loads replace every object
+    clear()
+
+
+def _handler_lists():
+    handlers = bpy.app.handlers
+    return [(getattr(handlers, name), handler) for name, handler in (
+        ("depsgraph_update_post", _on_depsgraph_update), ("load_post", _on_reload),
+        ("undo_post", _on_reload), ("redo_post", _on_reload)) if hasattr(handlers, name)]
+
+
+def register():
+    global _cached
+    _cached = hasattr(bpy.app.handlers, "depsgraph_update_post")
+    for handlers, handler in _handler_lists():
+        if handler not in handlers:
+            handlers.append(handler)
+
+
+def unregister():
+    global _cached
+    _cached = False
+    for handlers, handler in _handler_lists():
+        if handler in handlers:
+            handlers.remove(handler)
+    clear()
+
+
+def _scene_index(scene):
+    if not _cached:
+        return {"items": list(scene.objects.items()), "matched": {}}
+    index = _index.get(scene.as_pointer())
+    # objects added or removed without an update reaching the handler
+    if index is None or len(index["items"]) != len(scene.objects):
+        index = _index[scene.as_pointer()] = {"items": list(scene.objects.items()), "matched": {}}
+    return index
+
+
+def matched(scene, id_key):
+    # objects of scene whose name matches id_key, in the order of scene.objects
+    index = _scene_index(scene)
+    objs = index["matched"].get(id_key)
+    if objs is None:
+        search = pattern(id_key).search
+        objs = index["matched"][id_key] = [obj for name, obj in index["items"] if search(name)]
+    return objs
+
+
+def collection_objects(name):
+    # names of the objects of a collection and its children
+    if bpy.app.version < (2, 80, 0):
+        collection = bpy.data.groups.get(name)
+    else:
+        collection = bpy.data.collections.get(name)
+    if collection is None:
+        raise Exception("Collection not found: {}.".format(name))
+    objects = getattr(collection, "all_objects", None)
+    if objects is None:
+        names = set()
+        stack = [collection]
+        while stack:
+            c = stack.pop()
+            names.update(obj.name for obj in c.objects)
+            stack.extend(getattr(c, "children", ()))
+        return names
+    return {obj.name for obj in objects}
+
+
+def is_selected(obj):
+    if bpy.app.version < (2, 80, 0):
+        return obj.select
+    return obj.select_get()
+
+
+def is_animated(obj):
+    # the transform, or the evaluated mesh of a mesh, changes over the frames
+    if not sampling.is_static(obj):
+        return True
+    return obj.type == "MESH" and not sampling.is_static_mesh(obj)
+
+
+def filtered(scene, objs, types=()):
+    # objs kept by the collection, object types and animated filters of scene.
+    # types: object types accepted by the exporter, empty for any
+    if scene.save_keyframes_collection:
+        names = collection_objects(scene.save_keyframes_collection)
+        objs = [obj for obj in objs if obj.name in names]
+    for accepted in (set(types), set(scene.save_keyframes_object_types)):
+        if accepted:
+            objs = [obj for obj in objs if obj.type in accepted]
+    if scene.save_keyframes_animated_only:
+        objs = [obj for obj in objs if is_animated(obj)]
+    return list(objs)
+
+
+def select(context, types=(), selected=False):
+    # objects of the scene matched by the id key and kept by the filters,
+    # selected: only the selected ones
+    scene = context.scene
+    objs = matched(scene, scene.save_keyframes_id_key)
+    if selected:
+        objs = [obj for obj in objs if is_selected(obj)]
+    return filtered(scene, objs, types)
+
+
+def select_from(context, objs, types=()):
+    # objs matched by the id key and kept by the filters, in their order
+    search = pattern(context.scene.save_keyframes_id_key).search
+    return filtered(context.scene, [obj for obj in objs if search(obj.name)], types)
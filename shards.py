@@ -0,0 +1,169 @@
+"""
+export of mesh animations split across background blender processes.
+
+the frames of an export are split into contiguous shards, every shard is
+exported by `blender -b <saved .blend> --python __main__.py -- ...` (see
+cli.py) into a temporary file next to the output, and the shard files are
+merged in frame order. a worker which fails is started again up to `retries`
+times.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import bpy
+
+from . import formats
+from . import profiling
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__main__.py")
+# rows of a binary shard copied at once while merging
+MERGE_ROWS = 1 << 16
+
+
+def split_frames(frames, count):
+    # at most count contiguous, non empty chunks of frames, none if there
+    # are no frames
+    if len(frames) == 0:
+        return []
+    count = max(1, min(count, len(frames)))
+    size, extra = divmod(len(frames), count)
+    chunks = []
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(frames[start:end])
+        start = end
+    return chunks
+
+
+def worker_command(exporter, chunk, interval, output, scene, args):
+    return [
+        bpy.app.binary_path, "-b", bpy.data.filepath,
+        "--python-exit-code", "1", "--python", MAIN, "--",
+        "--exporter", exporter,
+        "--start", str(chunk[0]), "--end", str(chunk[-1]), "--interval", str(interval),
+        "--output", output, "--format", scene.save_keyframes_file_format,
+        "--precision", repr(scene.save_keyframes_precision), "--codec", scene.save_keyframes_codec,
+        "--workers", "1",
+        # values which may start with "-" as one argument, not read as an option
+        "--collection=" + scene.save_keyframes_collection,
+        "--types", *sorted(scene.save_keyframes_object_types),
+    ] + (["--animated-only"] if scene.save_keyframes_animated_only else []) \
+        + (["--isolate"] if scene.save_keyframes_isolate else []) \
+        + (["--decimals", str(scene.save_keyframes_decimals)] if scene.save_keyframes_fixed else []) \
+        + list(args)
+
+
+def run_workers(commands, workers, retries, directory):
+    # runs commands, at most workers at once, yields the index of every
+    # command which succeeded and None while waiting. every command is started
+    # again up to retries times while it exits with an error. workers still
+    # running are killed on an error or when the generator is closed
+    pending = [(i, 0) for i in range(len(commands))]
+    running = []
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                i, attempt = pending.pop(0)
+                log = open(os.path.join(directory, "shard_{:04d}.log".format(i)), "w")
+                process = subprocess.Popen(commands[i], stdout=log, stderr=subprocess.STDOUT)
+                running.append((process, i, attempt, log))
+            time.sleep(0.05)
+            yield None
+            for item in running[:]:
+                process, i, attempt, log = item
+                if process.poll() is None:
+                    continue
+                running.remove(item)
+                log.close()
+                if process.returncode == 0:
+                    yield i
+                    continue
+                if attempt < retries:
+                    pending.append((i, attempt + 1))
+                    continue
+                with open(log.name, encoding="utf-8", errors="replace") as f:
+                    tail = f.read()[-2000:]
+                raise Exception("Shard {} failed after {} attempts:\n{}".format(i, attempt + 1, tail))
+    finally:
+        for process, _, _, log in running:
+            process.kill()
+            process.wait()
+            log.close()
+
+
+def merge(outputs, filepath, scene, columns, suffix):
+    # shard files concatenated in order into filepath
+    file_format = scene.save_keyframes_file_format
+    if file_format == "CSV":
+        with formats.BackgroundFile(filepath, scene.save_keyframes_gzip) as f:
+            for output in outputs:
+                with open(output, "rb") as shard:
+                    for chunk in iter(lambda: shard.read(formats.WRITE_SIZE), b""):
+                        f.write(chunk)
+        return
+    with profiling.instrument(formats.open_writer(
+            filepath, file_format, columns, suffix=suffix,
+            precision=scene.save_keyframes_precision,
+            codec=scene.save_keyframes_codec)) as writer:
+        for output in outputs:
+            if file_format == "DELTA":
+                # record by record, a shard is never rebuilt in memory
+                for ids, frame, values in formats.iter_delta(output):
+                    writer.write(ids, frame, values)
+                continue
+            shard = formats.read_columnar(output)
+            names = shard["names"]
+            for start in range(0, shard["rows"], MERGE_ROWS):
+                end = start + MERGE_ROWS
+                writer.write([names[i] for i in shard["object"][start:end]],
+                             shard["frame"][start:end], shard["values"][start:end])
+            del shard
+
+
+def export_sharded(context, exporter, frames, interval, filepath, args,
+                   columns=formats.VERTEX_COLUMNS, suffix=formats.VERTEX_SUFFIX, report=None):
+    # exports frames with the save_keyframes_workers background processes,
+    # yields (frames done, frames total, frames written) like the exporters
+    # (see modal.py), no frame is written before the shards are merged.
+    # args: additional cli options of the exporter (id key, active object),
+    # --option=value for values which may start with "-".
+    # report: Operator.report() of the exporter, warned about unsaved changes
+    if not bpy.data.is_saved:
+        raise Exception("Please save blender file first.")
+    scene = context.scene
+    if not frames:
+        # nothing to split, the empty output of an export in this process
+        merge([], filepath, scene, columns, suffix)
+        return
+    # the export settings are passed on the command line, everything else
+    # comes from the saved file
+    if bpy.data.is_dirty and not bpy.app.background and report is not None:
+        report({"WARNING"}, "Workers read the saved .blend file, unsaved changes other than "
+                            "the export settings are not exported.")
+    file_format = scene.save_keyframes_file_format
+    directory = tempfile.mkdtemp(prefix=".shards_", dir=os.path.dirname(os.path.abspath(filepath)))
+    try:
+        outputs = []
+        commands = []
+        chunks = split_frames(list(frames), scene.save_keyframes_workers)
+        for i, chunk in enumerate(chunks):
+            output = os.path.join(directory, "shard_{:04d}{}".format(i, formats.EXTENSIONS[file_format]))
+            outputs.append(output)
+            commands.append(worker_command(exporter, chunk, interval, output, scene, args))
+        done = 0
+        for i in run_workers(commands, scene.save_keyframes_workers,
+                             scene.save_keyframes_worker_retries, directory):
+            if i is not None:
+                done += len(chunks[i])
+            yield done, len(frames), 0
+        profiling.output_file(filepath)
+        profiling.count("shards", len(chunks))
+        with profiling.phase("merge"):
+            merge(outputs, filepath, scene, columns, suffix)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)